@@ -5,12 +5,27 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime
+from pathlib import Path
+import base64
+import difflib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.feather as feather
 import folium
-from streamlit_folium import folium_static
-from folium.plugins import MarkerCluster, HeatMap, MeasureControl
+from branca.element import MacroElement
+from branca.utilities import write_png
+from jinja2 import Template
+import streamlit.components.v1 as components
+from folium.plugins import MarkerCluster, MeasureControl
 import pydeck as pdk
 import random
-from geopy.distance import geodesic
 import math
 
 # ============================================================================
@@ -199,60 +214,524 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ============================================================================
+# DISTANCE KERNELS
+# ============================================================================
+EARTH_RADIUS_M = 6371008.8
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres over whole coordinate arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def equirectangular_m(lat, lon, origin_lat, origin_lon):
+    """Local planar (x, y) metres east/north of the origin; sub-metre accurate at city scale"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    x = np.radians(lon - origin_lon) * np.cos(np.radians(origin_lat)) * EARTH_RADIUS_M
+    y = np.radians(lat - origin_lat) * EARTH_RADIUS_M
+    return x, y
+
+def planar_m(lat1, lon1, lat2, lon2):
+    """Euclidean distance in a local equirectangular projection, for segments of a few km"""
+    lat1, lon1, lat2, lon2 = (np.asarray(a, dtype=np.float64) for a in (lat1, lon1, lat2, lon2))
+    dx = np.radians(lon2 - lon1) * np.cos(np.radians((lat1 + lat2) / 2))
+    return EARTH_RADIUS_M * np.hypot(dx, np.radians(lat2 - lat1))
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+def _vincenty_terms(lam, sin_u1, cos_u1, sin_u2, cos_u2):
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+    cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+    # Coincident points have sin_sigma == 0, equatorial lines cos2_alpha == 0
+    sin_alpha = np.divide(cos_u1 * cos_u2 * sin_lam, sin_sigma, out=np.zeros_like(lam), where=sin_sigma > 0)
+    cos2_alpha = 1 - sin_alpha ** 2
+    cos_2sm = cos_sigma - np.divide(2 * sin_u1 * sin_u2, cos2_alpha, out=cos_sigma.copy(), where=cos2_alpha > 0)
+    return sin_sigma, cos_sigma, np.arctan2(sin_sigma, cos_sigma), sin_alpha, cos2_alpha, cos_2sm
+
+def vincenty_m(lat1, lon1, lat2, lon2, tol=1e-12, max_iter=200):
+    """Ellipsoidal (WGS-84) distance in metres by Vincenty's inverse formula over whole arrays.
+
+    Agrees with geopy's ``geodesic`` to within 1 mm. Only pairs that have not
+    yet converged are iterated; the rare near-antipodal pairs that never
+    converge fall back to the great-circle distance.
+    """
+    a, f = WGS84_A, WGS84_F
+    b = (1 - f) * a
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2)))
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (v.ravel() for v in (lat1, lon1, lat2, lon2))
+    big_l = lon2 - lon1
+    u1, u2 = np.arctan((1 - f) * np.tan(lat1)), np.arctan((1 - f) * np.tan(lat2))
+    units = (np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2))
+    lam = big_l.copy()
+    converged = np.zeros(len(lam), dtype=bool)
+    active = np.flatnonzero(np.isfinite(lam) & np.isfinite(u1) & np.isfinite(u2))
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        sin_sigma, cos_sigma, sigma, sin_alpha, cos2_alpha, cos_2sm = _vincenty_terms(lam[active], *(u[active] for u in units))
+        c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+        updated = big_l[active] + (1 - c) * f * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+        done = np.abs(updated - lam[active]) <= tol
+        lam[active] = updated
+        converged[active[done]] = True
+        active = active[~done]
+    
+    sin_sigma, cos_sigma, sigma, _, cos2_alpha, cos_2sm = _vincenty_terms(lam, *units)
+    u_sq = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+    big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sm ** 2)
+        - big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+    distance = np.where(converged, b * big_a * (sigma - delta_sigma),
+                        haversine_m(*(np.degrees(v) for v in (lat1, lon1, lat2, lon2))))
+    return distance.reshape(shape)
+
+# Pipe lengths use haversine unless a caller asks for another kernel; Vincenty
+# costs a few iterations per pipe for millimetre agreement with the ellipsoid
+DISTANCE_KERNELS = {'haversine': haversine_m, 'planar': planar_m, 'vincenty': vincenty_m}
+PIPE_LENGTH_METHOD = 'haversine'
+
+def pipe_lengths(pipes, method=PIPE_LENGTH_METHOD):
+    """Straight-line length in metres of every pipe from its end coordinates, by the ``method`` kernel"""
+    if method not in DISTANCE_KERNELS:
+        raise ValueError(f"unknown distance method {method!r}; expected one of {', '.join(DISTANCE_KERNELS)}")
+    return DISTANCE_KERNELS[method](
+        pipes['start_latitude'], pipes['start_longitude'], pipes['end_latitude'], pipes['end_longitude']
+    )
+
+# ============================================================================
+# SPATIAL INDEX
+# ============================================================================
+SPATIAL_CELL_M = 100
+
+def _ranges(starts, counts):
+    """Concatenated ``arange(start, start + count)`` runs, with the run each entry came from"""
+    owner = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return starts[owner] + offsets, owner
+
+class GridIndex:
+    """Grid-hash index over lat/lon points for bounding-box, radius and nearest queries.
+
+    Points are projected to local metres and bucketed into ``cell_m`` square
+    cells. Cell keys are column-major, so the cells of one grid column are a
+    contiguous run of the sorted keys and a rectangle costs one binary search
+    per column it spans. Queries return positions into the input arrays;
+    points with missing coordinates are never returned.
+    """
+
+    def __init__(self, lat, lon, cell_m=SPATIAL_CELL_M):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_m = cell_m
+        valid = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lon))
+        self.origin = (float(self.lat[valid].mean()), float(self.lon[valid].mean())) if len(valid) else (0.0, 0.0)
+        col, row = self._cell(self.lat[valid], self.lon[valid])
+        self.col0, self.row0 = (int(col.min()), int(row.min())) if len(valid) else (0, 0)
+        self.cols = int(col.max()) - self.col0 + 1 if len(valid) else 0
+        self.rows = int(row.max()) - self.row0 + 1 if len(valid) else 0
+        keys = (col - self.col0) * self.rows + (row - self.row0)
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.positions = keys[order], valid[order]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, lat, lon):
+        x, y = equirectangular_m(lat, lon, *self.origin)
+        return np.floor(x / self.cell_m).astype(np.int64), np.floor(y / self.cell_m).astype(np.int64)
+
+    def _candidates(self, south, west, north, east):
+        """Positions in every cell overlapping the box, padded by one cell for projection error"""
+        (c0, c1), (r0, r1) = (np.array(v) for v in self._cell([south, north], [west, east]))
+        c0, c1 = max(c0 - self.col0 - 1, 0), min(c1 - self.col0 + 1, self.cols - 1)
+        r0, r1 = max(r0 - self.row0 - 1, 0), min(r1 - self.row0 + 1, self.rows - 1)
+        if c0 > c1 or r0 > r1:
+            return np.array([], dtype=np.int64)
+        columns = np.arange(c0, c1 + 1) * self.rows
+        lo = np.searchsorted(self.keys, columns + r0, side='left')
+        hi = np.searchsorted(self.keys, columns + r1, side='right')
+        return self.positions[_ranges(lo, hi - lo)[0]]
+
+    def bbox(self, bounds):
+        """Positions inside (south, west, north, east), in input order"""
+        south, west, north, east = bounds
+        found = self._candidates(south, west, north, east)
+        lat, lon = self.lat[found], self.lon[found]
+        return np.sort(found[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)])
+
+    def within(self, lat, lon, radius_m):
+        """(positions, metres) of the points within ``radius_m`` of a point, nearest first"""
+        dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        found = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distance = haversine_m(lat, lon, self.lat[found], self.lon[found])
+        keep = distance <= radius_m
+        order = np.argsort(distance[keep], kind='stable')
+        return found[keep][order], distance[keep][order]
+
+    def nearest(self, lat, lon, k=1):
+        """(positions, metres) of the ``k`` points nearest a point, nearest first.
+
+        The search radius doubles from one cell until it holds ``k`` points, and
+        any ``k`` points within a radius include the ``k`` nearest overall.
+        """
+        k = min(k, len(self))
+        radius = self.cell_m
+        found, distance = self.within(lat, lon, radius)
+        while len(found) < k:
+            radius *= 2
+            found, distance = self.within(lat, lon, radius)
+        return found[:k], distance[:k]
+
+# ============================================================================
+# PERSISTENT TABLE CACHE
+# ============================================================================
+# Normalized tables are written as Feather files keyed by the content hash and
+# mtime of their source CSVs, so restarts and extra workers skip re-parsing.
+# Bump CACHE_VERSION whenever the shape of a normalized table changes.
+CACHE_DIR = Path(".cache/network")
+CACHE_VERSION = 9
+
+ROW_HASH = '_row_hash'
+
+def _load_manifest():
+    try:
+        manifest = json.loads((CACHE_DIR / "manifest.json").read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('files', {})
+    manifest.setdefault('tables', {})
+    return manifest
+
+def _save_manifest(manifest):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_DIR / f"manifest.json.{os.getpid()}"
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, CACHE_DIR / "manifest.json")
+
+def file_signature(path, manifest):
+    """mtime, size and SHA-1 of a source file; the hash is reused while mtime/size are unchanged"""
+    stat = os.stat(path)
+    known = manifest['files'].get(str(path))
+    if known and known['mtime_ns'] == stat.st_mtime_ns and known['size'] == stat.st_size:
+        return known
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    signature = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': digest.hexdigest()}
+    manifest['files'][str(path)] = signature
+    return signature
+
+def _fingerprint(signatures):
+    parts = [str(CACHE_VERSION), PIPE_LENGTH_METHOD]
+    for path, signature in sorted(signatures.items()):
+        parts.append(f"{path}:{signature['sha1']}:{signature['mtime_ns']}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+def source_signatures(sources, manifest=None):
+    """Signatures of a set of source files (raises FileNotFoundError if one is missing)"""
+    save = manifest is None
+    manifest = _load_manifest() if manifest is None else manifest
+    before = json.dumps(manifest['files'], sort_keys=True)
+    signatures = {str(path): file_signature(path, manifest) for path in sources}
+    if save and json.dumps(manifest['files'], sort_keys=True) != before:
+        _save_manifest(manifest)
+    return signatures
+
+def source_fingerprint(sources):
+    """Cache key for a set of source files (raises FileNotFoundError if one is missing)"""
+    return _fingerprint(source_signatures(sources))
+
+def data_version():
+    """Version string of the current survey data, used to key derived caches"""
+    try:
+        return source_fingerprint([MANHOLE_CSV, PIPE_CSV])
+    except FileNotFoundError:
+        return "sample"
+
+def _read_table(path):
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+def write_table(name, signatures, df):
+    """Persist a normalized table under the fingerprint of its source signatures"""
+    path = CACHE_DIR / f"{name}-{_fingerprint(signatures)}.feather"
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        feather.write_feather(df.reset_index(drop=True), tmp)
+        os.replace(tmp, path)
+        for stale in CACHE_DIR.glob(f"{name}-*.feather"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        manifest = _load_manifest()
+        manifest['tables'][name] = {'file': path.name, 'version': CACHE_VERSION, 'sources': signatures}
+        _save_manifest(manifest)
+    except (OSError, pa.ArrowException) as e:
+        st.warning(f"⚠️ Could not write {name} cache: {e}")
+
+def cached_table(name, sources, builder, update=None):
+    """Return ``builder()``'s table, served memory-mapped from disk while ``sources`` are unchanged.
+    
+    When the sources have changed, ``update`` (if given) is tried first to bring
+    the cached table up to date from the previous build; ``builder`` only runs
+    if that leaves no table for the current sources.
+    """
+    signatures = source_signatures(sources)
+    path = CACHE_DIR / f"{name}-{_fingerprint(signatures)}.feather"
+    if not path.exists() and update is not None:
+        try:
+            update()
+        except Exception:
+            # A failed partial update leaves the previous build in place; rebuild below
+            pass
+    if path.exists():
+        try:
+            return _read_table(path).drop(columns=ROW_HASH, errors='ignore')
+        except (OSError, pa.ArrowInvalid):
+            path.unlink(missing_ok=True)
+    
+    df = builder()
+    write_table(name, signatures, df)
+    return df.drop(columns=ROW_HASH, errors='ignore')
+
+# ============================================================================
+# DATA NORMALIZATION
+# ============================================================================
+# Fixed vocabularies for the survey's free-text fields. Category order is the
+# categorical code, so codes stay stable across loads and incremental refreshes.
+CONDITION_VOCAB = ['Good', 'Fair', 'Poor', 'Broken', 'Inaccessible', 'Unknown']
+CONDITION_ALIASES = {
+    'moderate': 'Fair',
+    'average': 'Fair',
+    'damaged': 'Poor',
+    'blocked': 'Poor',
+    'non openable': 'Inaccessible',
+    'not openable': 'Inaccessible',
+    'under the road': 'Inaccessible',
+}
+MATERIAL_VOCAB = ['Concrete', 'Brick', 'Laterite', 'Unknown']
+MATERIAL_ALIASES = {'rcc': 'Concrete', 'cement': 'Concrete'}
+COVER_TYPE_VOCAB = ['Concrete', 'Metal', 'Unknown']
+COVER_TYPE_ALIASES = {'rcc': 'Concrete', 'iron': 'Metal', 'cast iron': 'Metal', 'steel': 'Metal'}
+PIPE_MATERIAL_VOCAB = ['PVC', 'Stoneware', 'RCC', 'Concrete', 'Unknown']
+PIPE_MATERIAL_ALIASES = {'sw': 'Stoneware', 'stone ware': 'Stoneware', 'upvc': 'PVC'}
+
+def canonical_label(raw, vocabulary, aliases=None):
+    """Map one free-text survey value onto ``vocabulary`` ('Unknown' if nothing fits).
+    
+    Tries the whole value, the part before any '(' or ',' remark and its first
+    word against the vocabulary and aliases, then falls back to fuzzy matching
+    for typos such as 'Goo' or 'Modera'.
+    """
+    if pd.isna(raw):
+        return 'Unknown'
+    key = ' '.join(str(raw).lower().split())
+    lookup = {label.lower(): label for label in vocabulary}
+    lookup.update(aliases or {})
+    head = re.split(r'[(,]', key)[0].strip()
+    for candidate in (key, head, head.split(' ')[0] if head else ''):
+        if candidate in lookup:
+            return lookup[candidate]
+    match = difflib.get_close_matches(head or key, list(lookup), n=1, cutoff=0.75)
+    return lookup[match[0]] if match else 'Unknown'
+
+def normalize_categorical(series, vocabulary, aliases=None):
+    """Canonicalize a column into a Categorical over ``vocabulary``.
+    
+    Only the distinct raw values are matched; rows are then recoded with one
+    integer lookup on the categorical codes.
+    """
+    series = series.astype('category')
+    # One slot per raw category plus a trailing 'Unknown', which code -1 (missing) indexes
+    labels = [canonical_label(c, vocabulary, aliases) for c in series.cat.categories] + ['Unknown']
+    recode = np.array([vocabulary.index(label) for label in labels])
+    codes = recode[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=vocabulary), index=series.index)
+
+def diameter_label(raw):
+    """Canonical label and size in inches of a raw diameter (('Unknown', inf) when unparseable)"""
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mm|inch|in|")?', str(raw).lower())
+    if not match:
+        return 'Unknown', np.inf
+    size = float(match.group(1))
+    # Bare numbers in this survey are inches; anything implausibly large is millimetres
+    if match.group(2) == 'mm' or (match.group(2) is None and size > 48):
+        return f'{size:g}mm', size / 25.4
+    return f'{size:g} inch', size
+
+def diameter_order(label):
+    """Sort key putting canonical diameter labels in size order, 'Unknown' last"""
+    label, size = diameter_label(label)
+    return size, label
+
+def normalize_diameter(series):
+    """Canonicalize pipe diameters ('8', ' 8 inch', '8inch2', '200mm') into size-ordered categories"""
+    series = series.astype('category')
+    labels = [diameter_label(raw) for raw in series.cat.categories]
+    labels.append(('Unknown', np.inf))
+    vocabulary = [label for label, _ in sorted(set(labels), key=lambda item: (item[1], item[0]))]
+    recode = np.array([vocabulary.index(label) for label, _ in labels])
+    codes = recode[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=vocabulary), index=series.index)
+
+def parse_depth(series):
+    """Surveyed depths ('1.15m', '1.9 m', '2.85') in metres; blanks and unparseable values become NaN"""
+    metres = series.astype('string').str.extract(r'(\d+(?:\.\d+)?)', expand=False)
+    return pd.to_numeric(metres, errors='coerce').astype('float32')
+
 # ============================================================================
 # DATA LOADING FUNCTIONS
 # ============================================================================
-@st.cache_data
-def load_manhole_data():
-    """Load manhole master data with error handling and generate GPS coordinates"""
+# Source files and map defaults
+MANHOLE_CSV = "data/AddedFields.csv"
+PIPE_CSV = "data/Layer1Pipe.csv"
+BASE_LAT, BASE_LON = 12.9141, 74.8560
+
+# Dtypes are fixed up front so pandas never materializes object columns for
+# the low-cardinality attributes or float64 copies of the coordinates
+MANHOLE_DTYPES = {
+    'ID': 'string',
+    'Material': 'category',
+    'Condition': 'category',
+    'Cover type': 'category',
+    'pipe material': 'category',
+    'Pipe diameter': 'category',
+    'no of connnections': 'string',
+    'Depth': 'string',
+    'x': 'float32',
+    'y': 'float32',
+}
+
+PIPE_DTYPES = {
+    'ID': 'string',
+    'U/S MH': 'string',
+    'D/S MH': 'string',
+    'Length': 'string',
+    'Depth': 'string',
+}
+
+# Only these columns are parsed; GIS exports carry many more (photo metadata etc.)
+MANHOLE_COLUMNS = set(MANHOLE_DTYPES) | {'Road', 'Ward', 'Zone'}
+PIPE_COLUMNS = set(PIPE_DTYPES) | {'Layer'}
+
+# Files above the threshold are read in chunks, so the raw text of a wide export
+# is never parsed in one piece
+STREAM_THRESHOLD_BYTES = 32 * 1024 ** 2
+CSV_CHUNK_ROWS = 50_000
+
+def _usecols(columns):
+    return lambda name: name.strip() in columns
+
+# Fallback values are drawn per file row from a keyed hash of its position, so a
+# row gets the same values whether the file is read whole, streamed in chunks
+# or re-read as an appended tail
+ROW_RNG_KEY = 'mcc-sewer-rng-42'
+ROW_RNG_STREAMS = {'elevation': 0, 'latitude': 1, 'longitude': 2}
+SYNTHETIC_GRID_COLUMNS = 32
+
+def positional_uniform(positions, low, high, stream):
+    """Uniform draws in [low, high), one per file row position, for the named stream"""
+    keys = np.asarray(positions, dtype=np.uint64) * np.uint64(len(ROW_RNG_STREAMS)) + np.uint64(ROW_RNG_STREAMS[stream])
+    bits = pd.util.hash_array(keys, hash_key=ROW_RNG_KEY) >> np.uint64(11)
+    return low + bits * (high - low) / 2.0 ** 53
+
+def synthetic_grid_coordinates(positions, base_lat=BASE_LAT, base_lon=BASE_LON, spacing=0.0015, jitter=0.0005):
+    """Lay out the rows at file ``positions`` on a jittered grid around the base location (vectorized)"""
+    row, col = np.divmod(np.asarray(positions), SYNTHETIC_GRID_COLUMNS)
+    lats = base_lat + (row - SYNTHETIC_GRID_COLUMNS / 2) * spacing + positional_uniform(positions, -jitter, jitter, 'latitude')
+    lons = base_lon + (col - SYNTHETIC_GRID_COLUMNS / 2) * spacing + positional_uniform(positions, -jitter, jitter, 'longitude')
+    return lats.astype('float32'), lons.astype('float32')
+
+def row_hashes(raw):
+    """64-bit content hash of every raw survey row, used to diff re-exported CSVs"""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+def read_manhole_csv(source=MANHOLE_CSV):
+    """Read raw manhole survey rows with the typed ingest dtypes"""
+    return pd.read_csv(source, dtype=MANHOLE_DTYPES, usecols=_usecols(MANHOLE_COLUMNS))
+
+def stream_csv(source, dtypes, columns, clean, label):
+    """Read ``source`` in CSV_CHUNK_ROWS chunks, cleaning each chunk as it arrives.
+    
+    Raw chunks are dropped once cleaned, so the untyped export (every column,
+    object dtype) is never held in full. The typed table still grows with the
+    file: peak memory is one raw chunk plus about twice the typed table, while
+    the cleaned chunks are joined. Progress is reported from the bytes consumed.
+    """
+    size = max(os.path.getsize(source), 1)
+    progress = st.progress(0.0, text=f"Loading {label}...")
+    parts = []
+    with open(source, 'rb') as fh:
+        for chunk in pd.read_csv(fh, dtype=dtypes, usecols=_usecols(columns), chunksize=CSV_CHUNK_ROWS):
+            parts.append(clean(chunk))
+            done = min(fh.tell() / size, 1.0)
+            progress.progress(done, text=f"Loading {label}... {done:.0%}")
+    progress.empty()
+    return concat_tables(parts)
+
+def _clean_manhole_rows(df):
+    """Normalize raw survey rows into the typed manhole table (row-local, so it also serves upserts).
+    
+    The index must hold the rows' positions in the survey file, which key the
+    fallback coordinates and elevations.
+    """
+    positions = df.index.to_numpy()
+    df = df.reset_index(drop=True)
+    df[ROW_HASH] = row_hashes(df)
+    # Clean column names
+    df.columns = df.columns.str.strip()
+    
+    # Normalize column names
+    df['manhole_id'] = df['ID'].astype(str)
+    blank = pd.Series(pd.NA, index=df.index, dtype='string')
+    df['material'] = normalize_categorical(df['Material'], MATERIAL_VOCAB, MATERIAL_ALIASES)
+    df['condition'] = normalize_categorical(df['Condition'], CONDITION_VOCAB, CONDITION_ALIASES)
+    df['cover_type'] = normalize_categorical(df['Cover type'], COVER_TYPE_VOCAB, COVER_TYPE_ALIASES)
+    df['pipe_material'] = normalize_categorical(df.get('pipe material', blank), PIPE_MATERIAL_VOCAB, PIPE_MATERIAL_ALIASES)
+    df['pipe_diameter'] = normalize_diameter(df.get('Pipe diameter', blank))
+    df['no_of_connections'] = pd.to_numeric(df['no of connnections'], errors='coerce').fillna(0).astype(int)
+    df['road'] = df.get('Road', 'Road Data')
+    df['ward'] = df.get('Ward', 'Ward 1')
+    df['zone'] = df.get('Zone', 'Zone 1')
+    
+    # Surveyed coordinates: x is longitude, y is latitude
+    n = len(df)
+    lats = df['y'].to_numpy(dtype='float32', copy=True) if 'y' in df.columns else np.full(n, np.nan, dtype='float32')
+    lons = df['x'].to_numpy(dtype='float32', copy=True) if 'x' in df.columns else np.full(n, np.nan, dtype='float32')
+    
+    # Fall back to a synthetic layout around Mangalore only where the survey has no fix
+    unfixed = np.isnan(lats) | np.isnan(lons)
+    if unfixed.any():
+        lats[unfixed], lons[unfixed] = synthetic_grid_coordinates(positions[unfixed])
+    
+    df['latitude'] = lats
+    df['longitude'] = lons
+    df['elevation'] = positional_uniform(positions, 5, 50, 'elevation')
+    df['depth'] = parse_depth(df.get('Depth', blank))
+    
+    add_risk_scores(df)
+    
+    # Ensure all coordinates are valid
+    return df.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
+
+def _build_manhole_table():
+    """Parse and normalize the manhole survey CSV into the typed manhole table"""
+    if os.path.getsize(MANHOLE_CSV) > STREAM_THRESHOLD_BYTES:
+        return stream_csv(MANHOLE_CSV, MANHOLE_DTYPES, MANHOLE_COLUMNS, _clean_manhole_rows, "manhole survey")
+    return _clean_manhole_rows(read_manhole_csv())
+
+def _load_manhole_table():
+    """Normalized manhole table, from the on-disk cache while the CSV is unchanged (sample data without one)"""
     try:
-        df = pd.read_csv("data/AddedFields.csv")
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Normalize column names
-        df['manhole_id'] = df['ID'].astype(str)
-        df['material'] = df['Material'].fillna('Unknown')
-        df['condition'] = df['Condition'].fillna('Unknown')
-        df['cover_type'] = df['Cover type'].fillna('Unknown')
-        df['no_of_connections'] = pd.to_numeric(df['no of connnections'], errors='coerce').fillna(0).astype(int)
-        df['road'] = df.get('Road', 'Road Data')
-        df['ward'] = df.get('Ward', 'Ward 1')
-        df['zone'] = df.get('Zone', 'Zone 1')
-        
-        # Generate synthetic GPS coordinates for Mangalore region
-        np.random.seed(42)
-        n = len(df)
-        
-        # Generate realistic coordinates around Mangalore (12.9141° N, 74.8560° E)
-        base_lat, base_lon = 12.9141, 74.8560
-        
-        # Create a grid-like pattern for better visualization
-        grid_size = int(np.sqrt(n)) + 1
-        lats = []
-        lons = []
-        
-        for i in range(n):
-            row = i // grid_size
-            col = i % grid_size
-            lat = base_lat + (row - grid_size/2) * 0.0015
-            lon = base_lon + (col - grid_size/2) * 0.0015
-            lats.append(lat)
-            lons.append(lon)
-        
-        # Add some randomness
-        lats = np.array(lats) + np.random.uniform(-0.0005, 0.0005, n)
-        lons = np.array(lons) + np.random.uniform(-0.0005, 0.0005, n)
-        
-        df['latitude'] = lats
-        df['longitude'] = lons
-        df['elevation'] = np.random.uniform(5, 50, n)
-        df['depth'] = np.random.uniform(1.5, 4.5, n)
-        
-        # Ensure all coordinates are valid
-        df = df.dropna(subset=['latitude', 'longitude'])
-        
-        return df
+        return cached_table('manholes', [MANHOLE_CSV], _build_manhole_table, update=incremental_refresh)
     except FileNotFoundError:
         # Create comprehensive sample data
         return create_comprehensive_manhole_data()
@@ -260,6 +739,18 @@ def load_manhole_data():
         st.error(f"❌ Error loading manhole data: {e}")
         return create_comprehensive_manhole_data()
 
+@st.cache_resource(max_entries=2)
+def load_manhole_data(version):
+    """Load manhole master data with its network criticality columns.
+    
+    The table is shared read-only by every session (st.cache_data would hand each
+    caller its own unpickled copy); derive new frames from it, never modify it.
+    ``version`` (see data_version) keys the table to the survey it was read from,
+    like every resource derived from it. Criticality is folded in here so one
+    manhole frame is held per version.
+    """
+    return add_criticality(_load_manhole_table(), load_criticality(version))
+
 def create_comprehensive_manhole_data():
     """Create comprehensive sample manhole data"""
     np.random.seed(42)
@@ -288,9 +779,11 @@ def create_comprehensive_manhole_data():
     }
     
     df = pd.DataFrame(data)
+    for col in ['material', 'condition', 'cover_type']:
+        df[col] = df[col].astype('category')
     
     # Generate coordinates for Mangalore with realistic clustering
-    base_lat, base_lon = 12.9141, 74.8560
+    base_lat, base_lon = BASE_LAT, BASE_LON
     
     # Create clusters for different zones
     clusters = {
@@ -300,102 +793,172 @@ def create_comprehensive_manhole_data():
         'Zone D': (base_lat - 0.005, base_lon - 0.003)
     }
     
-    lats, lons = [], []
-    for zone in df['zone']:
-        cluster_lat, cluster_lon = clusters[zone]
-        lat = cluster_lat + np.random.uniform(-0.002, 0.002)
-        lon = cluster_lon + np.random.uniform(-0.002, 0.002)
-        lats.append(lat)
-        lons.append(lon)
+    cluster_lat = df['zone'].map({zone: c[0] for zone, c in clusters.items()}).to_numpy()
+    cluster_lon = df['zone'].map({zone: c[1] for zone, c in clusters.items()}).to_numpy()
     
-    df['latitude'] = lats
-    df['longitude'] = lons
+    df['latitude'] = (cluster_lat + np.random.uniform(-0.002, 0.002, n)).astype('float32')
+    df['longitude'] = (cluster_lon + np.random.uniform(-0.002, 0.002, n)).astype('float32')
     df['elevation'] = np.round(np.random.uniform(5, 100, n), 1)
     df['depth'] = np.round(np.random.uniform(1.5, 6.0, n), 1)
     
-    return df
+    return add_risk_scores(df)
 
-@st.cache_data
-def load_pipe_data():
-    """Load pipe network data with error handling"""
+def read_pipe_csv(source=PIPE_CSV):
+    """Read raw pipe rows with the typed ingest dtypes"""
+    return pd.read_csv(source, dtype=PIPE_DTYPES, usecols=_usecols(PIPE_COLUMNS))
+
+def _clean_pipe_rows(df, manhole_df):
+    """Normalize raw pipe rows and resolve them against the manhole table"""
+    # Streamed chunks keep their file row numbers in the index; use them for fallback IDs
+    positions = df.index.to_numpy() + 1
+    df = df.reset_index(drop=True)
+    hashes = row_hashes(df)
+    df.columns = df.columns.str.strip()
+    
+    # Normalize column names
+    if 'ID' in df.columns:
+        df['pipe_id'] = df['ID'].astype(str)
+    else:
+        df['pipe_id'] = [f'PIPE{i:04d}' for i in positions]
+    
+    df['length'] = pd.to_numeric(df.get('Length', np.nan), errors='coerce')
+    df['layer'] = df.get('Layer', 'Layer 1')
+    
+    if 'U/S MH' not in df.columns or 'D/S MH' not in df.columns:
+        raise ValueError("pipe table has no U/S MH / D/S MH columns")
+    
+    pipes = build_pipe_network(df, manhole_df)
+    pipes[ROW_HASH] = hashes
+    return pipes
+
+def _build_pipe_table(manhole_df):
+    """Parse the pipe CSV and resolve its U/S MH / D/S MH topology against ``manhole_df``"""
+    if os.path.getsize(PIPE_CSV) > STREAM_THRESHOLD_BYTES:
+        return stream_csv(PIPE_CSV, PIPE_DTYPES, PIPE_COLUMNS,
+                          lambda chunk: _clean_pipe_rows(chunk, manhole_df), "pipe network")
+    return _clean_pipe_rows(read_pipe_csv(), manhole_df)
+
+@st.cache_resource(max_entries=2)
+def load_pipe_data(version):
+    """Load pipe network data, from the on-disk cache while the CSVs are unchanged (shared read-only).
+    
+    Pipes are resolved against the normalized manhole table, read only when the
+    pipes have to be rebuilt; load_manhole_data itself depends on the pipes
+    through criticality.
+    """
     try:
-        df = pd.read_csv("data/Layer1Pipe.csv")
-        df.columns = df.columns.str.strip()
-        
-        # Normalize column names
-        if 'ID' in df.columns:
-            df['pipe_id'] = df['ID'].astype(str)
-        else:
-            df['pipe_id'] = [f'PIPE{i:04d}' for i in range(1, len(df)+1)]
-        
-        df['length'] = pd.to_numeric(df.get('Length', np.random.uniform(10, 200, len(df))), errors='coerce').fillna(50)
-        df['material'] = df.get('Material', 'PVC')
-        df['layer'] = df.get('Layer', 'Layer 1')
-        df['diameter'] = df.get('Diameter', '300mm')
-        
-        return create_realistic_pipe_network(df)
+        return cached_table('pipes', [PIPE_CSV, MANHOLE_CSV], lambda: _build_pipe_table(_load_manhole_table()),
+                            update=incremental_refresh)
     except FileNotFoundError:
-        return create_comprehensive_pipe_data()
+        return create_comprehensive_pipe_data(_load_manhole_table())
     except Exception as e:
         st.error(f"❌ Error loading pipe data: {e}")
-        return create_comprehensive_pipe_data()
+        return create_comprehensive_pipe_data(_load_manhole_table())
 
-def create_realistic_pipe_network(df):
-    """Create realistic pipe network based on manhole data"""
-    manhole_df = load_manhole_data()
-    
-    # Create pipe connections between nearby manholes
-    np.random.seed(42)
-    n_pipes = min(len(df), 100)
-    
-    pipe_data = []
-    manhole_coords = list(zip(manhole_df['longitude'], manhole_df['latitude'], manhole_df['manhole_id']))
-    
-    for i in range(n_pipes):
-        # Pick two random manholes
-        idx1, idx2 = np.random.choice(len(manhole_coords), 2, replace=False)
-        start_lon, start_lat, start_mh = manhole_coords[idx1]
-        end_lon, end_lat, end_mh = manhole_coords[idx2]
-        
-        # Calculate distance
-        distance = geodesic((start_lat, start_lon), (end_lat, end_lon)).meters
-        
-        # Determine pipe properties based on manhole conditions
-        start_condition = manhole_df.loc[manhole_df['manhole_id'] == start_mh, 'condition'].iloc[0]
-        end_condition = manhole_df.loc[manhole_df['manhole_id'] == end_mh, 'condition'].iloc[0]
-        
-        # Pipe material based on age and condition
-        materials = ['PVC', 'Concrete', 'Clay', 'HDPE', 'Cast Iron']
-        material_probs = [0.4, 0.3, 0.15, 0.1, 0.05]
-        material = np.random.choice(materials, p=material_probs)
-        
-        # Diameter based on connections
-        diameters = ['150mm', '225mm', '300mm', '450mm', '600mm']
-        diameter = np.random.choice(diameters, p=[0.1, 0.2, 0.4, 0.2, 0.1])
-        
-        pipe_data.append({
-            'pipe_id': f'P{i:04d}',
-            'start_latitude': start_lat,
-            'start_longitude': start_lon,
-            'end_latitude': end_lat,
-            'end_longitude': end_lon,
-            'calculated_length': distance,
-            'length': distance,
-            'material': material,
-            'diameter': diameter,
-            'layer': 'Layer 1',
-            'depth': np.random.uniform(2.0, 6.0),
-            'slope': np.random.uniform(0.5, 3.0),
-            'flow_capacity': np.random.uniform(10, 100),
-            'connected_manholes': f'{start_mh}-{end_mh}',
-            'condition': 'Good' if start_condition == 'Good' and end_condition == 'Good' else 'Fair'
-        })
-    
-    return pd.DataFrame(pipe_data)
+def derive_pipe_condition(start_condition, end_condition):
+    """Pipe condition from the conditions of its two end manholes (vectorized)"""
+    start = np.asarray(start_condition, dtype=object)
+    end = np.asarray(end_condition, dtype=object)
+    either = lambda values: np.isin(start, values) | np.isin(end, values)
+    return np.select(
+        [pd.isna(start) | pd.isna(end), either(['Poor', 'Broken']), either(['Fair']), (start == 'Good') & (end == 'Good')],
+        ['Unknown', 'Poor', 'Fair', 'Good'],
+        default='Fair'
+    )
+
+def build_pipe_network(df, manhole_df, method=PIPE_LENGTH_METHOD):
+    """Join pipes to their end manholes through a hash index on manhole_id.
+    
+    Every pipe is resolved in one vectorized pass. Pipes whose U/S MH or D/S MH
+    is not in the manhole survey are kept with empty coordinates and flagged
+    in ``is_dangling`` (see ``dangling_references``).
+    """
+    upstream = df['U/S MH'].astype(str).str.strip()
+    downstream = df['D/S MH'].astype(str).str.strip()
+    pipes = pd.DataFrame({
+        'pipe_id': df['pipe_id'].to_numpy(),
+        'upstream_mh': upstream.to_numpy(),
+        'downstream_mh': downstream.to_numpy(),
+        'surveyed_length': df['length'].to_numpy(dtype=float, na_value=np.nan),
+        'layer': df['layer'].to_numpy(),
+        'depth': parse_depth(df.get('Depth', pd.Series(pd.NA, index=df.index, dtype='string'))).to_numpy(dtype=float, na_value=np.nan),
+        'connected_manholes': (upstream + '-' + downstream).to_numpy(),
+    })
+    return resolve_pipe_ends(pipes, manhole_df, method)
+
+# Manhole areas copied onto both ends of every pipe
+PIPE_END_AREAS = ['zone', 'ward']
+
+def resolve_pipe_ends(pipes, manhole_df, method=PIPE_LENGTH_METHOD):
+    """(Re)derive every pipe column that comes from its end manholes, in place.
+    
+    ``method`` names the DISTANCE_KERNELS entry used for calculated lengths.
+    """
+    manholes = manhole_df.drop_duplicates('manhole_id')
+    mh_index = pd.Index(manholes['manhole_id'])
+    us_pos = mh_index.get_indexer(pipes['upstream_mh'])
+    ds_pos = mh_index.get_indexer(pipes['downstream_mh'])
+    us_ok, ds_ok = us_pos >= 0, ds_pos >= 0
+    
+    def lookup(column, pos, ok, fill=np.nan):
+        values = manholes[column].to_numpy()
+        if len(values) == 0:
+            return np.full(len(pos), fill, dtype=object)
+        return np.where(ok, values[pos], fill)
+    
+    def lookup_category(column, pos, ok):
+        values = manholes[column].astype('category')
+        categories = values.cat.categories
+        if 'Unknown' not in categories:
+            categories = categories.append(pd.Index(['Unknown']))
+        unknown = categories.get_loc('Unknown')
+        codes = np.append(values.cat.codes.to_numpy(), -1)
+        codes = np.where(ok, codes[pos], -1)
+        return pd.Categorical.from_codes(np.where(codes < 0, unknown, codes), categories=categories)
+    
+    pipes['start_latitude'] = lookup('latitude', us_pos, us_ok).astype(float)
+    pipes['start_longitude'] = lookup('longitude', us_pos, us_ok).astype(float)
+    pipes['end_latitude'] = lookup('latitude', ds_pos, ds_ok).astype(float)
+    pipes['end_longitude'] = lookup('longitude', ds_pos, ds_ok).astype(float)
+    pipes['calculated_length'] = pipe_lengths(pipes, method)
+    # Surveyed length wins; the straight-line distance fills the gaps
+    pipes['length'] = pipes['surveyed_length'].fillna(pipes['calculated_length']).fillna(0)
+    # Pipe attributes are recorded at the upstream manhole in the survey
+    pipes['material'] = lookup_category('pipe_material', us_pos, us_ok)
+    pipes['diameter'] = lookup_category('pipe_diameter', us_pos, us_ok)
+    pipes['condition'] = pd.Categorical(
+        derive_pipe_condition(lookup('condition', us_pos, us_ok, None), lookup('condition', ds_pos, ds_ok, None)),
+        categories=CONDITION_VOCAB
+    )
+    pipes['is_dangling'] = ~(us_ok & ds_ok)
+    # Zone and ward of each end, so area filters are a bitmap lookup rather than a join
+    for area in PIPE_END_AREAS:
+        if area in manholes.columns:
+            pipes[f'upstream_{area}'] = lookup_category(area, us_pos, us_ok)
+            pipes[f'downstream_{area}'] = lookup_category(area, ds_pos, ds_ok)
+    # Invert depths: the pipe's own survey depth at the upstream end, manhole depths otherwise
+    pipes['start_depth'] = pipes['depth'].fillna(pd.Series(lookup('depth', us_pos, us_ok), index=pipes.index).astype(float))
+    pipes['end_depth'] = pd.Series(lookup('depth', ds_pos, ds_ok), index=pipes.index).astype(float).fillna(pipes['start_depth'])
+    return pipes
+
+def dangling_references(pipe_df, manhole_df):
+    """Pipes whose upstream or downstream manhole is missing from the survey"""
+    if 'is_dangling' not in pipe_df.columns:
+        return pd.DataFrame(columns=['pipe_id', 'upstream_mh', 'downstream_mh', 'missing'])
+    dangling = pipe_df.loc[pipe_df['is_dangling'], ['pipe_id', 'upstream_mh', 'downstream_mh']].copy()
+    known = pd.Index(manhole_df['manhole_id'].unique())
+    us_missing = ~dangling['upstream_mh'].isin(known)
+    ds_missing = ~dangling['downstream_mh'].isin(known)
+    dangling['missing'] = np.select(
+        [us_missing & ds_missing, us_missing], ['U/S + D/S', 'U/S'], default='D/S'
+    )
+    return dangling
 
-def create_comprehensive_pipe_data():
-    """Create comprehensive pipe network data"""
-    manhole_df = load_manhole_data()
+# Sample pipes join manholes at most this far apart, as laterals rarely run further
+SAMPLE_PIPE_RADIUS_M = 150
+
+def create_comprehensive_pipe_data(manhole_df, method=PIPE_LENGTH_METHOD):
+    """Create comprehensive pipe network data between the manholes of ``manhole_df``"""
     np.random.seed(42)
     
     # Create pipes connecting manholes
@@ -408,24 +971,28 @@ def create_comprehensive_pipe_data():
     diameters = ['150mm', '225mm', '300mm', '450mm', '600mm']
     layers = ['Layer 1', 'Layer 2', 'Layer 3']
     
+    grid = GridIndex(manhole_df['latitude'].to_numpy(), manhole_df['longitude'].to_numpy())
+    zones = manhole_df['zone'].to_numpy()
+    
     for i in range(n_pipes):
-        # Pick two random manholes (prefer same zone)
+        # Pick a random manhole and join it to a neighbour (prefer same zone, else the nearest)
         idx1 = np.random.randint(len(manhole_coords))
-        zone = manhole_coords[idx1][4]
-        same_zone_indices = [idx for idx, mh in enumerate(manhole_coords) if mh[4] == zone and idx != idx1]
-        
-        if same_zone_indices:
-            idx2 = np.random.choice(same_zone_indices)
+        start_lon, start_lat = manhole_coords[idx1][:2]
+        neighbours = grid.within(start_lat, start_lon, SAMPLE_PIPE_RADIUS_M)[0]
+        neighbours = neighbours[neighbours != idx1]
+        same_zone = neighbours[zones[neighbours] == zones[idx1]]
+        
+        if len(same_zone):
+            idx2 = np.random.choice(same_zone)
+        elif len(neighbours):
+            idx2 = np.random.choice(neighbours)
         else:
-            idx2 = np.random.randint(len(manhole_coords))
-            while idx2 == idx1:
-                idx2 = np.random.randint(len(manhole_coords))
+            nearest = grid.nearest(start_lat, start_lon, k=2)[0]
+            idx2 = nearest[nearest != idx1][0]
         
         start_lon, start_lat, start_mh, start_cond, start_zone = manhole_coords[idx1]
         end_lon, end_lat, end_mh, end_cond, end_zone = manhole_coords[idx2]
         
-        distance = geodesic((start_lat, start_lon), (end_lat, end_lon)).meters
-        
         # Assign properties
         material = np.random.choice(materials, p=[0.4, 0.3, 0.15, 0.1, 0.05])
         diameter = np.random.choice(diameters, p=[0.1, 0.2, 0.4, 0.2, 0.1])
@@ -441,12 +1008,12 @@ def create_comprehensive_pipe_data():
         
         pipe_data.append({
             'pipe_id': f'PIPE{i:04d}',
+            'upstream_mh': start_mh,
+            'downstream_mh': end_mh,
             'start_latitude': start_lat,
             'start_longitude': start_lon,
             'end_latitude': end_lat,
             'end_longitude': end_lon,
-            'length': distance,
-            'calculated_length': distance,
             'material': material,
             'diameter': diameter,
             'layer': layer,
@@ -456,16 +1023,1055 @@ def create_comprehensive_pipe_data():
             'installation_year': np.random.randint(1990, 2023),
             'condition': condition,
             'maintenance_status': 'Scheduled' if condition == 'Poor' else 'OK',
-            'connected_manholes': f'{start_mh}-{end_mh}'
+            'connected_manholes': f'{start_mh}-{end_mh}',
+            'is_dangling': False
         })
     
-    return pd.DataFrame(pipe_data)
+    pipes = pd.DataFrame(pipe_data)
+    areas = manhole_df.drop_duplicates('manhole_id').set_index('manhole_id')
+    for area in (area for area in PIPE_END_AREAS if area in areas.columns):
+        for end in ('upstream', 'downstream'):
+            pipes[f'{end}_{area}'] = pipes[f'{end}_mh'].map(areas[area]).astype('category')
+    # One vectorized pass for every pipe length instead of a geodesic call per pipe
+    pipes['length'] = pipes['calculated_length'] = pipe_lengths(pipes, method)
+    return pipes
+
+# ============================================================================
+# RISK SCORING
+# ============================================================================
+# Weight tables are plain dicts, so an alternative scoring policy can be passed
+# to score_risk without touching the scoring code.
+RISK_WEIGHTS = {
+    'condition': {'Good': 1, 'Fair': 2, 'Poor': 3, 'Broken': 4},
+    'default_condition': 2,
+    'connections_per_point': 5,
+    'max_connection_score': 3,
+    'max_criticality_score': 1,
+}
+RISK_BINS = [0, 2, 4, 6, 8]
+RISK_LABELS = ['Low', 'Medium', 'High', 'Critical']
+
+def condition_scores(condition, weights=RISK_WEIGHTS):
+    """Condition score per row via a lookup on the categorical codes"""
+    condition = condition.astype('category')
+    default = weights['default_condition']
+    # One slot per category plus a trailing default, which code -1 (missing) indexes
+    lookup = np.array(
+        [weights['condition'].get(c, default) for c in condition.cat.categories] + [default],
+        dtype='float32'
+    )
+    return lookup[condition.cat.codes.to_numpy()]
+
+def score_risk(df, weights=RISK_WEIGHTS):
+    """Risk score and category for every manhole in one vectorized pass"""
+    connection_score = np.clip(
+        df['no_of_connections'].to_numpy(dtype='float32') / weights['connections_per_point'],
+        0, weights['max_connection_score']
+    )
+    score = condition_scores(df['condition'], weights) + connection_score
+    if 'criticality' in df.columns:
+        # Network criticality is only known once the pipe graph is built (see add_criticality)
+        score = score + weights['max_criticality_score'] * df['criticality'].to_numpy(dtype='float32')
+    return score, pd.cut(score, bins=RISK_BINS, labels=RISK_LABELS)
+
+def add_risk_scores(df, weights=RISK_WEIGHTS):
+    """Attach risk_score / risk_category columns (run once at load time)"""
+    df['risk_score'], df['risk_category'] = score_risk(df, weights)
+    return df
+
+# ============================================================================
+# INCREMENTAL REFRESH
+# ============================================================================
+# Categorical columns whose vocabulary is data-dependent but has a canonical order
+CATEGORY_ORDER = {'pipe_diameter': diameter_order, 'diameter': diameter_order}
+
+def concat_tables(frames):
+    """Concatenate table fragments, keeping categorical columns categorical.
+    
+    Fixed vocabularies, shared by every fragment, come through unchanged.
+    Otherwise the merged categories are put in canonical order (CATEGORY_ORDER,
+    else sorted as read_csv orders a whole file), so the result matches
+    reading the rows in one piece. Fragments are only shallow-copied, so the
+    join holds the fragments plus the result, not a third copy.
+    """
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            vocabularies = [frame[col].astype('category').cat.categories for frame in frames]
+            categories = vocabularies[0]
+            if any(not vocabulary.equals(categories) for vocabulary in vocabularies[1:]):
+                categories = pd.Index(sorted(set().union(*vocabularies), key=CATEGORY_ORDER.get(col)))
+            for frame in frames:
+                frame[col] = frame[col].astype('category').cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+def upsert_rows(table, rows, key, deleted=()):
+    """Replace the rows of ``table`` whose ``key`` appears in ``rows`` (or ``deleted``) and append ``rows``"""
+    replaced = pd.Index(rows[key]).union(pd.Index(deleted))
+    return concat_tables([table[~table[key].isin(replaced)], rows])
+
+def changed_source_rows(path, old_signature, new_signature, reader):
+    """Raw rows of ``path`` that may differ from the cached build.
+    
+    Returns ``(rows, complete)``. When the file only grew (its old bytes are
+    unchanged) just the appended tail is parsed and ``complete`` is False;
+    otherwise the whole file is returned so deletions can be detected. Either
+    way the rows are indexed by their position in the file, as a full read
+    would index them.
+    """
+    if new_signature['sha1'] == old_signature['sha1']:
+        return None, False
+    if new_signature['size'] > old_signature['size']:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as fh:
+            header = fh.readline()
+            fh.seek(0)
+            remaining = old_signature['size']
+            newlines, block = 0, b''
+            while remaining > 0:
+                block = fh.read(min(1 << 20, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                newlines += block.count(b'\n')
+                remaining -= len(block)
+            if digest.hexdigest() == old_signature['sha1']:
+                tail = fh.read()
+                if not header.endswith(b'\n'):
+                    header += b'\n'
+                # Rows already in the file: every line but the header, plus an unterminated last one
+                old_rows = newlines - 1 + (not block.endswith(b'\n'))
+                rows = reader(io.BytesIO(header + tail.lstrip(b'\r\n')))
+                rows.index = rows.index + old_rows
+                return rows, False
+    return reader(path), True
+
+def _diff_rows(table, raw, ids, key, complete):
+    """Split raw rows into new/edited ones and the keys that disappeared"""
+    known = pd.Series(table[ROW_HASH].to_numpy(), index=table[key])
+    known = known[~known.index.duplicated(keep='last')]
+    changed = known.reindex(ids).to_numpy() != row_hashes(raw)
+    deleted = known.index.difference(ids) if complete else pd.Index([])
+    return raw[changed], deleted
+
+def incremental_refresh():
+    """Apply only the survey rows added or edited since the cached tables were built.
+    
+    Changed manholes are re-cleaned (which recomputes their row-level derived
+    columns), and pipes are re-resolved only when they changed themselves or
+    touch a changed manhole. Returns ``(manholes, pipes)`` change counts, or
+    None when there is no usable cache and a full rebuild is required.
+    """
+    manifest = _load_manifest()
+    tables = manifest['tables']
+    if any(tables.get(name, {}).get('version') != CACHE_VERSION for name in ('manholes', 'pipes')):
+        return None
+    try:
+        manholes = _read_table(CACHE_DIR / tables['manholes']['file'])
+        pipes = _read_table(CACHE_DIR / tables['pipes']['file'])
+        signatures = source_signatures([MANHOLE_CSV, PIPE_CSV])
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if ROW_HASH not in manholes.columns or ROW_HASH not in pipes.columns:
+        return None
+    
+    # Manholes: upsert new/edited survey rows by ID
+    raw, complete = changed_source_rows(
+        MANHOLE_CSV, tables['manholes']['sources'][MANHOLE_CSV], signatures[MANHOLE_CSV], read_manhole_csv
+    )
+    touched = pd.Index([])
+    if raw is not None:
+        raw, deleted = _diff_rows(manholes, raw, raw['ID'].astype(str), 'manhole_id', complete)
+        cleaned = _clean_manhole_rows(raw)
+        manholes = upsert_rows(manholes, cleaned, 'manhole_id', deleted)
+        touched = pd.Index(cleaned['manhole_id']).union(deleted)
+    manhole_table = manholes.drop(columns=ROW_HASH)
+    
+    # Pipes: upsert new/edited rows, then re-resolve pipes whose end manholes changed
+    raw, complete = changed_source_rows(
+        PIPE_CSV, tables['pipes']['sources'][PIPE_CSV], signatures[PIPE_CSV], read_pipe_csv
+    )
+    changed_pipes = 0
+    if raw is not None:
+        # Fallback IDs follow the file position, as _clean_pipe_rows numbers them
+        ids = raw['ID'].astype(str) if 'ID' in raw.columns else pd.Series([f'PIPE{i:04d}' for i in raw.index + 1], index=raw.index)
+        raw, deleted = _diff_rows(pipes, raw, ids, 'pipe_id', complete)
+        cleaned = _clean_pipe_rows(raw, manhole_table)
+        pipes = upsert_rows(pipes, cleaned, 'pipe_id', deleted)
+        changed_pipes = len(cleaned) + len(deleted)
+    if len(touched):
+        affected = pipes['upstream_mh'].isin(touched) | pipes['downstream_mh'].isin(touched)
+        # Re-resolved ends may carry new zones, wards or materials, so merge the
+        # categories rather than writing into the (read-only, memory-mapped) table
+        resolved = resolve_pipe_ends(pipes.loc[affected].copy(), manhole_table)
+        pipes = concat_tables([pipes[~affected], resolved])
+        changed_pipes += int(affected.sum())
+    
+    manhole_sources = {MANHOLE_CSV: signatures[MANHOLE_CSV]}
+    pipe_sources = {PIPE_CSV: signatures[PIPE_CSV], MANHOLE_CSV: signatures[MANHOLE_CSV]}
+    if manhole_sources != tables['manholes']['sources'] or pipe_sources != tables['pipes']['sources']:
+        write_table('manholes', manhole_sources, manholes)
+        write_table('pipes', pipe_sources, pipes)
+    return len(touched), changed_pipes
+
+# ============================================================================
+# FILTER INDEX
+# ============================================================================
+MANHOLE_FILTER_COLUMNS = ['condition', 'material', 'cover_type', 'ward', 'zone', 'no_of_connections']
+PIPE_FILTER_COLUMNS = ['material', 'diameter', 'layer', 'condition',
+                       'upstream_zone', 'downstream_zone', 'upstream_ward', 'downstream_ward']
+# How the two ends of a pipe combine when filtering pipes by manhole area
+PIPE_END_MATCH = {'Either end': np.bitwise_or, 'Both ends': np.bitwise_and}
+
+class FilterIndex:
+    """Packed bitmaps, one per distinct value of each filterable column.
+    
+    Filters are answered with bitwise AND/OR over the cached bitmaps; rows are
+    only materialized when a view asks for them with ``take``.
+    """
+    
+    def __init__(self, df, columns, key=None):
+        self.frame = df
+        self.key = key
+        self.size = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            values = df[col].astype('category')
+            codes = values.cat.codes.to_numpy()
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(values.cat.categories) + 1))
+            bitmaps = {}
+            for i, value in enumerate(values.cat.categories):
+                rows = order[bounds[i]:bounds[i + 1]]
+                if len(rows):
+                    mask = np.zeros(self.size, dtype=bool)
+                    mask[rows] = True
+                    bitmaps[value] = np.packbits(mask)
+            self.bitmaps[col] = bitmaps
+    
+    def all(self):
+        return np.packbits(np.ones(self.size, dtype=bool))
+    
+    def none(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+    
+    def from_mask(self, mask):
+        return np.packbits(np.asarray(mask, dtype=bool))
+    
+    def select(self, selections, base=None):
+        """AND across columns of the OR of each column's selected values.
+        
+        Empty or None selections leave a column unconstrained, matching the
+        multiselect convention of the views.
+        """
+        bits = self.all() if base is None else base.copy()
+        for col, values in selections.items():
+            if col not in self.bitmaps or values is None or len(values) == 0:
+                continue
+            chosen = self.none()
+            for value in values:
+                bitmap = self.bitmaps[col].get(value)
+                if bitmap is not None:
+                    np.bitwise_or(chosen, bitmap, out=chosen)
+            np.bitwise_and(bits, chosen, out=bits)
+        return bits
+    
+    def values(self, col, bits=None):
+        """Distinct values of ``col`` that occur within ``bits``"""
+        return [value for value, bitmap in self.bitmaps.get(col, {}).items()
+                if bits is None or np.bitwise_and(bitmap, bits).any()]
+    
+    def positions(self, bits):
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+    
+    def count(self, bits):
+        return int(np.unpackbits(bits, count=self.size).sum())
+    
+    def take(self, bits):
+        """Rows selected by ``bits``; the base frame itself when nothing is filtered out"""
+        positions = self.positions(bits)
+        if len(positions) == self.size:
+            return self.frame
+        return self.frame.iloc[positions]
+
+@st.cache_resource(max_entries=4)
+def load_filter_index(name, version):
+    """Filter index over the manhole or pipe table, built once per data version"""
+    if name == 'manholes':
+        return FilterIndex(load_manhole_data(version), MANHOLE_FILTER_COLUMNS, key=(name, version))
+    return FilterIndex(load_pipe_data(version), PIPE_FILTER_COLUMNS, key=(name, version))
+
+def pipe_area_scope(pipe_index, areas, match='Either end', base=None):
+    """Pipes whose end manholes lie in the selected zones/wards.
+    
+    ``areas`` maps ``zone``/``ward`` to the selected values. Each end must lie
+    in every selected area, as a manhole must for the manhole scope; the
+    upstream and downstream results are then combined per ``match`` (either
+    end or both ends).
+    """
+    selected = {area: values for area, values in areas.items() if values is not None and len(values)}
+    bits = pipe_index.all() if base is None else base.copy()
+    if not selected:
+        return bits
+    upstream = pipe_index.select({f'upstream_{area}': values for area, values in selected.items()})
+    downstream = pipe_index.select({f'downstream_{area}': values for area, values in selected.items()})
+    np.bitwise_and(bits, PIPE_END_MATCH[match](upstream, downstream), out=bits)
+    return bits
+
+# ============================================================================
+# TABLE INDEX
+# ============================================================================
+TOKEN_PATTERN = r'[0-9a-z]+'
+# Sorts after every token that starts with a given prefix
+_PREFIX_END = chr(0x10FFFF)
+
+def tokenize(values):
+    """Lower-cased alphanumeric tokens of each value, as (token, value position) arrays"""
+    tokens = pd.Series(values, dtype=object).astype(str).str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    return tokens.to_numpy(dtype=object), tokens.index.to_numpy(dtype=np.int64)
+
+class TableIndex:
+    """Sort orders and inverted search indexes over the rows of a base table.
+    
+    Both are built lazily, once per column, over the whole table. Any filtered
+    subset is then sorted by an O(n) gather of the precomputed order, and
+    searched by binary search on the token vocabulary, so a page of a large
+    table is served without sorting, scanning or serializing the other rows.
+    """
+    
+    def __init__(self, df, key=None):
+        self.frame = df
+        self.key = key
+        self.size = len(df)
+        self._keys = {}
+        self._orders = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+    
+    def sort_keys(self, col):
+        """Float sort key of ``col``: the values, category codes or alphabetical ranks (NaN when missing)"""
+        with self._lock:
+            if col not in self._keys:
+                values = self.frame[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    keys = values.cat.codes.to_numpy(dtype=float)
+                    keys[keys < 0] = np.nan
+                elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                    keys = values.to_numpy(dtype=float, na_value=np.nan)
+                else:
+                    codes, _ = pd.factorize(values.astype('string').str.lower(), sort=True)
+                    keys = codes.astype(float)
+                    keys[codes < 0] = np.nan
+                self._keys[col] = keys
+            return self._keys[col]
+    
+    def order(self, col, descending=False):
+        """Row positions of the whole table sorted by ``col``, missing values last"""
+        keys = self.sort_keys(col)
+        with self._lock:
+            if (col, descending) not in self._orders:
+                self._orders[col, descending] = np.argsort(-keys if descending else keys, kind='stable')
+            return self._orders[col, descending]
+    
+    def sorted_positions(self, positions, col, descending=False):
+        """``positions`` in ``col`` order, by filtering the table-wide order instead of sorting"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        order = self.order(col, descending)
+        return order[mask[order]]
+    
+    def seek_key(self, col, text, descending=False):
+        """Sort key where ``text`` starts in ``col`` order, or None when it cannot be compared.
+        
+        Descending, that is the last value ``text`` prefixes, so the seek lands
+        at the top of the matching run either way.
+        """
+        values = self.frame[col]
+        text = text.strip().lower()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            labels = values.cat.categories.astype(str).str.lower()
+            matches = np.flatnonzero(labels.str.startswith(text))
+            return float(matches[-1 if descending else 0]) if len(matches) else None
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            try:
+                return float(text)
+            except ValueError:
+                return None
+        labels = np.sort(values.dropna().astype(str).str.lower().unique())
+        if descending:
+            return float(np.searchsorted(labels, text + _PREFIX_END) - 1)
+        return float(np.searchsorted(labels, text))
+    
+    def postings(self, col):
+        """Inverted index of ``col``: sorted token vocabulary with the rows holding each token"""
+        with self._lock:
+            if col not in self._postings:
+                codes, uniques = pd.factorize(self.frame[col])
+                # Tokenize the distinct values only, then fan out to their rows
+                tokens, owners = tokenize(uniques)
+                by_token = np.argsort(tokens, kind='stable')
+                rows = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[rows], np.arange(len(uniques) + 1))
+                self._postings[col] = (tokens[by_token], owners[by_token], rows, bounds)
+            return self._postings[col]
+    
+    def search(self, columns, query):
+        """Boolean row mask for rows where every query token prefixes a token in one of ``columns``"""
+        mask = np.ones(self.size, dtype=bool)
+        terms, _ = tokenize([query])
+        for term in terms:
+            hits = np.zeros(self.size, dtype=bool)
+            for col in columns:
+                vocabulary, owners, rows, bounds = self.postings(col)
+                lo, hi = np.searchsorted(vocabulary, [term, term + _PREFIX_END])
+                matched = np.unique(owners[lo:hi])
+                positions, _ = _ranges(bounds[matched], bounds[matched + 1] - bounds[matched])
+                hits[rows[positions]] = True
+            mask &= hits
+        return mask
+
+@st.cache_resource(max_entries=4)
+def load_table_index(name, version, _frame):
+    """Table index over the manhole or pipe table, shared per data version"""
+    return TableIndex(_frame, key=(name, version))
+
+def table_index_for(index):
+    """Table index over the base frame of a filter index"""
+    name, version = index.key
+    return load_table_index(name, version, index.frame)
+
+# ============================================================================
+# AGGREGATION CUBE
+# ============================================================================
+LENGTH_BIN_M = 5
+
+# risk_category follows from condition, connections and criticality, so it adds few cells
+MANHOLE_CUBE_DIMS = ['zone', 'ward', 'condition', 'material', 'cover_type', 'no_of_connections', 'risk_category']
+MANHOLE_CUBE_MEASURES = {
+    'count': ('manhole_id', 'size'),
+    'total_connections': ('no_of_connections', 'sum')
+}
+PIPE_CUBE_DIMS = ['material', 'diameter', 'layer', 'condition', 'length_bin']
+PIPE_CUBE_MEASURES = {
+    'count': ('pipe_id', 'size'),
+    'total_length': ('length', 'sum'),
+    'max_length': ('length', 'max')
+}
+
+def build_cube(df, dims, measures):
+    """One row per observed combination of ``dims``, holding additive measures"""
+    dims = [col for col in dims if col in df.columns]
+    measures = {name: spec for name, spec in measures.items() if spec[0] in df.columns}
+    return df.groupby(dims, observed=True, dropna=False).agg(**measures).reset_index()
+
+def rollup(cube, by=(), filters=None):
+    """Aggregate the cube cells matching ``filters`` up to the ``by`` dimensions.
+    
+    Filters follow the multiselect convention of ``FilterIndex.select``. With no
+    ``by`` the grand totals come back as a Series.
+    """
+    cells = cube
+    for col, values in (filters or {}).items():
+        if col in cells.columns and values is not None and len(values) > 0:
+            cells = cells[cells[col].isin(values)]
+    how = {col: 'max' if col == 'max_length' else 'sum'
+           for col in cells.columns if col in MANHOLE_CUBE_MEASURES or col in PIPE_CUBE_MEASURES}
+    by = [by] if isinstance(by, str) else list(by)
+    if not by:
+        return cells.agg(how)
+    return cells.groupby(by, observed=True).agg(how)
+
+def wilson_interval(successes, totals, z=1.96):
+    """Wilson score interval for a binomial proportion, as (low, high) arrays"""
+    successes = np.asarray(successes, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = successes / totals
+        denominator = 1 + z ** 2 / totals
+        centre = (p + z ** 2 / (2 * totals)) / denominator
+        half_width = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denominator
+    return centre - half_width, centre + half_width
+
+@st.cache_data(max_entries=64)
+def performance_metrics(cube, key, filters=None, label=None):
+    """Condition and connection metrics per value of ``key``, from a single roll-up.
+    
+    Percentages come with 95% Wilson intervals so small groups are not over-read.
+    """
+    cells = rollup(cube, [key, 'condition'], filters)
+    counts = cells['count'].unstack(fill_value=0)
+    total = counts.sum(axis=1)
+    good = counts.reindex(columns=['Good'], fill_value=0).sum(axis=1)
+    poor = counts.reindex(columns=['Poor', 'Broken'], fill_value=0).sum(axis=1)
+    good_low, good_high = wilson_interval(good, total)
+    poor_low, poor_high = wilson_interval(poor, total)
+    metrics = pd.DataFrame({
+        label or key: counts.index.astype(object),
+        'Total Count': total.to_numpy(),
+        'Good Condition %': (good / total * 100).to_numpy(),
+        'Good CI Low %': good_low * 100,
+        'Good CI High %': good_high * 100,
+        'Poor/Broken %': (poor / total * 100).to_numpy(),
+        'Poor CI Low %': poor_low * 100,
+        'Poor CI High %': poor_high * 100
+    })
+    if 'total_connections' in cells.columns:
+        connections = cells['total_connections'].groupby(level=0, observed=True).sum()
+        metrics['Avg Connections'] = (connections / total).to_numpy()
+    return metrics
+
+@st.cache_resource(max_entries=32)
+def load_cube(name, version, scope_key, _index, _bits):
+    """Cube over the rows in scope; ``scope_key`` stands in for the unhashed bitmap"""
+    df = _index.take(_bits)
+    if name == 'manholes':
+        return build_cube(df, MANHOLE_CUBE_DIMS, MANHOLE_CUBE_MEASURES)
+    df = df.assign(length_bin=df['length'] // LENGTH_BIN_M * LENGTH_BIN_M)
+    return build_cube(df, PIPE_CUBE_DIMS, PIPE_CUBE_MEASURES)
+
+def cube_for(index, bits):
+    """Aggregation cube for the rows of ``index`` selected by ``bits``"""
+    name, version = index.key
+    return load_cube(name, version, hashlib.sha1(bits.tobytes()).hexdigest(), index, bits)
+
+# ============================================================================
+# SEWER GRAPH
+# ============================================================================
+def _csr(rows, cols, n):
+    """CSR arrays (ptr, neighbours, edge ids) for edges rows[i] -> cols[i] over n nodes"""
+    order = np.argsort(rows, kind='stable')
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=ptr[1:])
+    return ptr, cols[order], order
+
+def _slots(ptr, nodes):
+    """Positions of the CSR entries of ``nodes``, with the index into ``nodes`` each came from"""
+    nodes = np.asarray(nodes, dtype=np.int64)
+    return _ranges(ptr[nodes], ptr[nodes + 1] - ptr[nodes])
+
+def _gather(ptr, values, nodes):
+    """Concatenated CSR slices for ``nodes``, with the index into ``nodes`` each entry came from"""
+    positions, owner = _slots(ptr, nodes)
+    return values[positions], owner
+
+class SewerGraph:
+    """Directed pipe network over integer node ids, with CSR adjacency both ways.
+    
+    Edge ``i`` is row ``i`` of the pipe table and runs upstream -> downstream.
+    Node ``k`` is manhole ``nodes[k]``; ``out_*`` arrays list downstream
+    neighbours and ``in_*`` arrays upstream ones. Degree queries take an
+    optional edge mask so a filtered view can reuse the cached graph.
+    
+    Edges not marked ``resolved`` (pipes with an end missing from the survey)
+    keep their id but join no adjacency, so they add no nodes, degree, flow,
+    betweenness or trace reach.
+    """
+    
+    def __init__(self, upstream, downstream, resolved=None):
+        upstream = np.asarray(upstream, dtype=object)
+        downstream = np.asarray(downstream, dtype=object)
+        self.resolved = np.ones(len(upstream), dtype=bool) if resolved is None else np.asarray(resolved, dtype=bool)
+        live = np.flatnonzero(self.resolved)
+        self.nodes = pd.Index(pd.unique(np.concatenate([upstream[live], downstream[live]])))
+        self.src = self.nodes.get_indexer(upstream)
+        self.dst = self.nodes.get_indexer(downstream)
+        n = len(self.nodes)
+        self.out_ptr, self.out_idx, order = _csr(self.src[live], self.dst[live], n)
+        self.out_edge = live[order]
+        self.in_ptr, self.in_idx, order = _csr(self.dst[live], self.src[live], n)
+        self.in_edge = live[order]
+    
+    @classmethod
+    def from_pipes(cls, pipe_df):
+        resolved = ~pipe_df['is_dangling'].to_numpy(dtype=bool) if 'is_dangling' in pipe_df.columns else None
+        return cls(pipe_df['upstream_mh'].astype(str), pipe_df['downstream_mh'].astype(str), resolved)
+    
+    @property
+    def size(self):
+        return len(self.nodes)
+    
+    def node_ids(self, manhole_ids):
+        """Integer ids for manhole ids (-1 where the manhole has no pipes)"""
+        return self.nodes.get_indexer(pd.Index(manhole_ids).astype(str))
+    
+    def _edges(self, edges):
+        edges = np.flatnonzero(self.resolved) if edges is None else np.asarray(edges, dtype=np.int64)
+        edges = edges[self.resolved[edges]]
+        return self.src[edges], self.dst[edges]
+    
+    def out_degree(self, edges=None):
+        return np.bincount(self._edges(edges)[0], minlength=self.size)
+    
+    def in_degree(self, edges=None):
+        return np.bincount(self._edges(edges)[1], minlength=self.size)
+    
+    def degree(self, edges=None):
+        return self.out_degree(edges) + self.in_degree(edges)
+    
+    def downstream_neighbours(self, nodes):
+        """(neighbour ids, index into ``nodes``) for every downstream edge of ``nodes``"""
+        return _gather(self.out_ptr, self.out_idx, nodes)
+    
+    def upstream_neighbours(self, nodes):
+        """(neighbour ids, index into ``nodes``) for every upstream edge of ``nodes``"""
+        return _gather(self.in_ptr, self.in_idx, nodes)
+    
+    def connected_components(self, edges=None):
+        """Weakly connected component label per node (0..k-1), by min-label propagation with pointer jumping"""
+        src, dst = self._edges(edges)
+        labels = np.arange(self.size)
+        while True:
+            previous = labels.copy()
+            low = np.minimum(labels[src], labels[dst])
+            np.minimum.at(labels, src, low)
+            np.minimum.at(labels, dst, low)
+            labels = labels[labels]
+            if np.array_equal(labels, previous):
+                break
+        return np.unique(labels, return_inverse=True)[1]
+    
+    def trace(self, start, downstream=False):
+        """Nodes and edges reachable from node ``start``: its upstream catchment, or
+        with ``downstream`` the path(s) to the outfall. Level-synchronous BFS over CSR.
+        """
+        if downstream:
+            ptr, neighbours, edge_ids = self.out_ptr, self.out_idx, self.out_edge
+        else:
+            ptr, neighbours, edge_ids = self.in_ptr, self.in_idx, self.in_edge
+        visited = np.zeros(self.size, dtype=bool)
+        visited[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        edges = []
+        while len(frontier):
+            if len(frontier) == 1:
+                positions = np.arange(ptr[frontier[0]], ptr[frontier[0] + 1])
+            else:
+                positions = _slots(ptr, frontier)[0]
+            edges.append(edge_ids[positions])
+            reached = neighbours[positions]
+            # A node reached twice in one level is expanded twice; the visited mask keeps that bounded
+            frontier = reached[~visited[reached]]
+            visited[frontier] = True
+        edges = np.unique(np.concatenate(edges)) if edges else np.array([], dtype=np.int64)
+        return np.flatnonzero(visited), edges
+
+    def flow_accumulation(self, lengths, batch=1024):
+        """Upstream catchment of every node: distinct manholes and pipe length draining through it.
+
+        A node's catchment is every node with a path to it, so assets on a survey
+        loop or on both branches of a bifurcation are counted once, matching
+        ``trace``. Upstream length is the inflowing pipe length of every
+        catchment node, the node itself included.
+
+        A network without loops or bifurcations is a forest, where one
+        topological pass (Kahn, a level at a time) summing totals down the
+        out-edges is exact. Otherwise sources run ``batch`` at a time as bitsets
+        pushed down the out-edges until no node gains a bit.
+        """
+        lengths = np.asarray(lengths, dtype=np.float64)
+        live = np.flatnonzero(self.resolved)
+        inflow = np.bincount(self.dst[live], weights=lengths[live], minlength=self.size)
+        assets = np.zeros(self.size, dtype=np.float64)
+        length = inflow.copy()
+        pending = self.in_degree()
+        frontier = np.flatnonzero(pending == 0)
+        released = len(frontier)
+        while len(frontier):
+            positions, owner = _slots(self.out_ptr, frontier)
+            src, dst = frontier[owner], self.out_idx[positions]
+            np.add.at(assets, dst, assets[src] + 1)
+            np.add.at(length, dst, length[src])
+            np.subtract.at(pending, dst, 1)
+            frontier = np.unique(dst[pending[dst] == 0])
+            released += len(frontier)
+        if released == self.size and self.out_degree().max(initial=0) <= 1:
+            return assets, length
+        
+        assets[:] = 0
+        length[:] = 0
+        words = -(-batch // 64)
+        for start in range(0, self.size, words * 64):
+            sources = np.arange(start, min(start + words * 64, self.size))
+            bit = (sources - start).astype(np.uint64)
+            # reach[v] holds a bit for every source in this batch with a path to v
+            reach = np.zeros((self.size, words), dtype=np.uint64)
+            reach[sources, bit // np.uint64(64)] = np.uint64(1) << (bit % np.uint64(64))
+            frontier = sources
+            while len(frontier):
+                positions, owner = _slots(self.out_ptr, frontier)
+                if not len(positions):
+                    break
+                order = np.argsort(self.out_idx[positions], kind='stable')
+                src, dst = frontier[owner][order], self.out_idx[positions][order]
+                targets, first = np.unique(dst, return_index=True)
+                merged = reach[targets] | np.bitwise_or.reduceat(reach[src], first, axis=0)
+                frontier = targets[(merged != reach[targets]).any(axis=1)]
+                reach[targets] = merged
+            touched = np.flatnonzero(reach.any(axis=1))
+            for rows in np.array_split(touched, max(1, -(-len(touched) // 2048))):
+                members = np.unpackbits(reach[rows].astype('<u8').view(np.uint8), axis=1, bitorder='little')
+                members = members[:, :len(sources)].astype(np.float64)
+                assets[rows] += members.sum(axis=1)
+                length[rows] += members @ inflow[sources]
+        # Every node reaches itself but is not its own upstream asset
+        return assets - 1, length
+
+    def betweenness(self, samples=None, seed=0, batch=32):
+        """Directed betweenness per node by Brandes' algorithm over hop-count shortest paths.
+
+        With ``samples`` only that many random sources are expanded and the
+        dependencies are scaled up by ``size / samples`` (Brandes & Pich), which
+        keeps large networks tractable at the cost of an unbiased estimate.
+        Sources run ``batch`` at a time as one BFS over (source, node) states, so
+        the per-level numpy overhead is shared across the batch.
+        """
+        n = self.size
+        sources = np.arange(n)
+        if samples is not None and samples < n:
+            sources = np.random.default_rng(seed).choice(n, samples, replace=False)
+        centrality = np.zeros(n, dtype=np.float64)
+        for chunk in np.array_split(sources, max(1, -(-len(sources) // batch))):
+            # State b * n + v is node v in the search from chunk[b]
+            roots = np.arange(len(chunk)) * n + chunk
+            dist = np.full(len(chunk) * n, -1, dtype=np.int64)
+            sigma = np.zeros(len(chunk) * n, dtype=np.float64)
+            dist[roots], sigma[roots] = 0, 1.0
+            frontier, depth, levels = roots, 0, []
+            while len(frontier):
+                positions, owner = _slots(self.out_ptr, frontier % n)
+                src = frontier[owner]
+                dst = src - src % n + self.out_idx[positions]
+                fresh = dst[dist[dst] < 0]
+                dist[fresh] = depth + 1
+                # Shortest-path DAG edges for this level, kept for the dependency sweep
+                on_path = dist[dst] == depth + 1
+                src, dst = src[on_path], dst[on_path]
+                np.add.at(sigma, dst, sigma[src])
+                levels.append((src, dst))
+                frontier, depth = np.unique(fresh), depth + 1
+            delta = np.zeros(len(chunk) * n, dtype=np.float64)
+            for src, dst in reversed(levels):
+                np.add.at(delta, src, sigma[src] / sigma[dst] * (1 + delta[dst]))
+            delta[roots] = 0
+            centrality += delta.reshape(len(chunk), n).sum(axis=0)
+        return centrality * (n / len(sources)) if len(sources) else centrality
+
+@st.cache_resource(max_entries=2)
+def load_sewer_graph(version):
+    """Sewer graph over the full pipe table, built once per data version"""
+    return SewerGraph.from_pipes(load_pipe_data(version))
+
+# Criticality blends how much of the network drains through a node with how many
+# shortest flow paths cross it; both are log-scaled to 0..1 before weighting.
+CRITICALITY_WEIGHTS = {'upstream_assets': 0.5, 'betweenness': 0.5}
+BETWEENNESS_SAMPLES = 256
+CRITICAL_NODE_THRESHOLD = 0.5
+
+def _log_scale(values):
+    scaled = np.log1p(np.asarray(values, dtype=np.float64))
+    return scaled / scaled.max() if len(scaled) and scaled.max() > 0 else scaled
+
+def criticality_table(graph, pipe_df, samples=BETWEENNESS_SAMPLES, weights=CRITICALITY_WEIGHTS):
+    """Per-manhole flow accumulation, betweenness and blended criticality score"""
+    assets, length = graph.flow_accumulation(pipe_df['length'].to_numpy(dtype=float, na_value=0))
+    centrality = graph.betweenness(samples)
+    metrics = {'upstream_assets': assets, 'betweenness': centrality}
+    score = sum(weight * _log_scale(metrics[name]) for name, weight in weights.items())
+    return pd.DataFrame({
+        'manhole_id': graph.nodes.astype(str),
+        'upstream_assets': assets.astype('int64'),
+        'upstream_length_m': length.astype('float32'),
+        'betweenness': centrality.astype('float32'),
+        'criticality': np.asarray(score, dtype='float32'),
+    })
+
+@st.cache_data
+def load_criticality(version):
+    """Criticality per manhole, served from the on-disk cache while the CSVs are unchanged"""
+    build = lambda: criticality_table(load_sewer_graph(version), load_pipe_data(version))
+    try:
+        return cached_table('criticality', [PIPE_CSV, MANHOLE_CSV], build)
+    except FileNotFoundError:
+        return build()
+
+def add_criticality(manhole_df, criticality):
+    """Copy of ``manhole_df`` with criticality columns and risk re-scored; manholes without pipes score 0"""
+    columns = criticality.set_index('manhole_id').reindex(manhole_df['manhole_id'].astype(str))
+    # Copy-on-write makes the copy share the untouched columns instead of duplicating the table
+    with pd.option_context('mode.copy_on_write', True):
+        manhole_df = manhole_df.assign(**{
+            column: columns[column].fillna(0).to_numpy(dtype=criticality[column].dtype)
+            for column in criticality.columns.drop('manhole_id')
+        })
+        return add_risk_scores(manhole_df)
+
+@st.cache_data(max_entries=256)
+def trace_network(version, manhole_id, downstream=False):
+    """Memoized trace from ``manhole_id``, as (manhole ids, pipe table rows); None if it has no pipes"""
+    graph = load_sewer_graph(version)
+    start = graph.node_ids([manhole_id])[0]
+    if start < 0:
+        return None
+    nodes, edges = graph.trace(start, downstream)
+    return graph.nodes[nodes].to_numpy(), edges
 
 # ============================================================================
 # GEOSPATIAL HELPER FUNCTIONS
 # ============================================================================
-def create_folium_map(manhole_df, pipe_df, center_lat=12.9141, center_lon=74.8560, zoom_start=14):
-    """Create interactive Folium map"""
+CONDITION_COLORS = {'Good': 'green', 'Fair': 'blue', 'Poor': 'orange', 'Broken': 'red', 'Inaccessible': 'purple', 'Unknown': 'gray'}
+MANHOLE_POPUP_FIELDS = {
+    'material': 'Material',
+    'cover_type': 'Cover Type',
+    'no_of_connections': 'Connections',
+    'zone': 'Zone',
+    'ward': 'Ward'
+}
+
+def _pack_array(values, dtype):
+    """Little-endian typed array as base64, decoded client-side into the matching JS TypedArray"""
+    return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii')
+
+def _pack_column(series):
+    """Dictionary-encode a column as (labels, uint32 codes) so repeated values are sent once"""
+    values = pd.Categorical(series.astype(str))
+    return {'labels': list(values.categories), 'codes': _pack_array(values.codes, 'uint32')}
+
+class ManholeLayer(MacroElement):
+    """All manholes as one typed-array payload, drawn as canvas circle markers.
+    
+    Points are coloured client-side from their condition code, and popups are
+    rendered on click from the dictionary-encoded attribute columns instead of
+    being pre-baked into the page for every marker.
+    """
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var data = {{ this.payload|tojson }};
+            function unpack(b64, Type) {
+                var raw = atob(b64), bytes = new Uint8Array(raw.length);
+                for (var i = 0; i < raw.length; i++) { bytes[i] = raw.charCodeAt(i); }
+                return new Type(bytes.buffer);
+            }
+            var lat = unpack(data.lat, Float32Array), lon = unpack(data.lon, Float32Array);
+            var condition = unpack(data.condition, Uint8Array);
+            var columns = {};
+            Object.keys(data.columns).forEach(function(key) {
+                columns[key] = {labels: data.columns[key].labels, codes: unpack(data.columns[key].codes, Uint32Array)};
+            });
+            function field(key, i) { return columns[key].labels[columns[key].codes[i]]; }
+            function popup(layer) {
+                var i = layer.options.row, label = data.conditions[condition[i]];
+                var html = '<div style="font-family: Arial; width: 250px;">'
+                    + '<h4 style="color: #1a5490; margin-bottom: 8px;">🔍 Manhole #' + field('manhole_id', i) + '</h4>'
+                    + '<hr style="margin: 5px 0; border-color: #eee;">'
+                    + '<p><strong>Condition:</strong> <span style="color: ' + data.palette[condition[i]]
+                    + '; font-weight: bold;">' + label + '</span></p>';
+                data.fields.forEach(function(f) {
+                    html += '<p><strong>' + f[1] + ':</strong> ' + (columns[f[0]] ? field(f[0], i) : 'N/A') + '</p>';
+                });
+                return html + '<hr style="margin: 8px 0;"><p style="font-size: 0.9em;"><strong>Coordinates:</strong><br>'
+                    + 'Lat: ' + lat[i].toFixed(6) + '<br>Lon: ' + lon[i].toFixed(6) + '</p></div>';
+            }
+            var renderer = L.canvas();
+            for (var i = 0; i < lat.length; i++) {
+                L.circleMarker([lat[i], lon[i]], {
+                    row: i, renderer: renderer, radius: {{ this.radius }}, weight: 1,
+                    color: data.palette[condition[i]], fillColor: data.palette[condition[i]], fillOpacity: 0.85
+                }).bindPopup(popup, {maxWidth: 300})
+                  .bindTooltip(function(layer) {
+                      var i = layer.options.row;
+                      return 'Manhole #' + field('manhole_id', i) + ' - ' + data.conditions[condition[i]];
+                  })
+                  .addTo({{ this._parent.get_name() }});
+            }
+        })();
+        {% endmacro %}
+    """)
+    
+    def __init__(self, manhole_df, radius=6):
+        super().__init__()
+        self._name = 'ManholeLayer'
+        self.radius = radius
+        conditions = list(CONDITION_COLORS)
+        codes = pd.Categorical(manhole_df['condition'].astype(str), categories=conditions).codes
+        codes = np.where(codes < 0, conditions.index('Unknown'), codes)
+        columns = {'manhole_id': _pack_column(manhole_df['manhole_id'])}
+        for col in MANHOLE_POPUP_FIELDS:
+            if col in manhole_df.columns:
+                columns[col] = _pack_column(manhole_df[col])
+        self.payload = {
+            'lat': _pack_array(manhole_df['latitude'], 'float32'),
+            'lon': _pack_array(manhole_df['longitude'], 'float32'),
+            'condition': _pack_array(codes, 'uint8'),
+            'conditions': conditions,
+            'palette': [CONDITION_COLORS[c] for c in conditions],
+            'columns': columns,
+            'fields': list(MANHOLE_POPUP_FIELDS.items())
+        }
+
+# Level of detail: above LOD_ASSET_LIMIT assets the map shows grid cells from a
+# precomputed pyramid below LOD_DETAIL_ZOOM, and only the assets in view above it
+LOD_ZOOMS = range(10, 19)
+LOD_DETAIL_ZOOM = 16
+LOD_CELL_PX = 64
+LOD_ASSET_LIMIT = 2000
+TILE_PX = 256
+
+def mercator_pixels(lat, lon, zoom):
+    """Web-Mercator pixel coordinates of lat/lon at a Leaflet zoom level"""
+    scale = TILE_PX * 2.0 ** zoom
+    phi = np.radians(np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / np.pi) / 2.0 * scale
+    return x, y
+
+def viewport_bounds(center_lat, center_lon, zoom, width_px, height_px, margin=0.5):
+    """(south, west, north, east) of a width x height map, padded by ``margin`` viewports for panning"""
+    scale = TILE_PX * 2.0 ** zoom
+    cx, cy = mercator_pixels(center_lat, center_lon, zoom)
+    half_w, half_h = width_px * (0.5 + margin), height_px * (0.5 + margin)
+    to_lon = lambda x: x / scale * 360.0 - 180.0
+    to_lat = lambda y: np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y / scale))))
+    return (float(to_lat(cy + half_h)), float(to_lon(cx - half_w)),
+            float(to_lat(cy - half_h)), float(to_lon(cx + half_w)))
+
+def in_bounds(lat, lon, bounds):
+    south, west, north, east = bounds
+    lat, lon = np.asarray(lat), np.asarray(lon)
+    return (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+def segments_in_bounds(start_lat, start_lon, end_lat, end_lon, bounds):
+    """Segments whose bounding box meets ``bounds``, so one crossing the view with both ends outside is kept"""
+    south, west, north, east = bounds
+    start_lat, start_lon = np.asarray(start_lat, dtype=float), np.asarray(start_lon, dtype=float)
+    end_lat, end_lon = np.asarray(end_lat, dtype=float), np.asarray(end_lon, dtype=float)
+    return ((np.minimum(start_lat, end_lat) <= north) & (np.maximum(start_lat, end_lat) >= south)
+            & (np.minimum(start_lon, end_lon) <= east) & (np.maximum(start_lon, end_lon) >= west))
+
+def manhole_location(manhole_df, manhole_id):
+    """(lat, lon) of ``manhole_id`` in ``manhole_df``, or None if it is not there"""
+    match = np.flatnonzero(manhole_df['manhole_id'].astype(str).to_numpy() == manhole_id)
+    if not len(match):
+        return None
+    row = manhole_df.iloc[match[0]]
+    return float(row['latitude']), float(row['longitude'])
+
+@st.cache_resource(max_entries=16)
+def load_spatial_index(version, frame_key, _lat, _lon):
+    """Grid index over a frame's coordinates, built once per data version and frame"""
+    return GridIndex(_lat, _lon)
+
+def build_grid_pyramid(manhole_df, zooms=LOD_ZOOMS, cell_px=LOD_CELL_PX):
+    """Manholes aggregated into cell_px grid cells for every zoom level.
+    
+    Cells are keyed at the finest zoom once; each coarser level merges the one
+    below by halving the cell keys, so building all levels stays O(rows).
+    """
+    zooms = sorted(zooms)
+    lat = manhole_df['latitude'].to_numpy(dtype=float)
+    lon = manhole_df['longitude'].to_numpy(dtype=float)
+    x, y = mercator_pixels(lat, lon, zooms[-1])
+    level = pd.DataFrame({
+        'cx': (x // cell_px).astype(np.int64),
+        'cy': (y // cell_px).astype(np.int64),
+        'count': 1,
+        'critical': manhole_df['condition'].isin(['Poor', 'Broken']).to_numpy(dtype=int),
+        'lat_sum': lat,
+        'lon_sum': lon
+    })
+    pyramid = {}
+    for zoom in reversed(zooms):
+        level = level.groupby(['cx', 'cy'], sort=False, as_index=False).sum()
+        pyramid[zoom] = level.assign(
+            latitude=level['lat_sum'] / level['count'],
+            longitude=level['lon_sum'] / level['count']
+        )[['cx', 'cy', 'count', 'critical', 'latitude', 'longitude']]
+        level = level.assign(cx=level['cx'] // 2, cy=level['cy'] // 2)
+    return pyramid
+
+@st.cache_data(max_entries=16)
+def load_grid_pyramid(version, scope_key, _manhole_df):
+    """Grid pyramid for the manholes in scope; ``scope_key`` stands in for the unhashed frame"""
+    return build_grid_pyramid(_manhole_df)
+
+# Server-side density rasters: points are binned on the Web-Mercator pixel grid of
+# the requested zoom, blurred, and shipped as one PNG overlay
+DENSITY_MAX_PX = 1024
+DENSITY_RADIUS_PX = 15
+DENSITY_WEIGHTS = {
+    'Condition': lambda df: df['condition'].astype(object).map({'Poor': 2.0, 'Broken': 3.0}).fillna(1.0),
+    'Connections': lambda df: df['no_of_connections'].astype(float)
+}
+HEAT_GRADIENT = [(0.0, (0, 0, 255)), (0.4, (0, 0, 255)), (0.65, (255, 255, 0)), (1.0, (255, 0, 0))]
+HOT_GRADIENT = [(0.0, (10, 0, 0)), (0.35, (230, 0, 0)), (0.7, (255, 210, 0)), (1.0, (255, 255, 255))]
+
+def gaussian_blur(grid, sigma):
+    """Separable Gaussian blur (kernel truncated at 3 sigma)"""
+    if sigma < 0.5:
+        return grid
+    radius = int(3 * sigma + 0.5)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    grid = np.apply_along_axis(np.convolve, 0, grid, kernel, mode='same')
+    return np.apply_along_axis(np.convolve, 1, grid, kernel, mode='same')
+
+def density_grid(lat, lon, weights, zoom, radius_px=DENSITY_RADIUS_PX, max_px=DENSITY_MAX_PX):
+    """Weighted point density on the zoom's pixel grid, as (grid, (south, west, north, east)).
+    
+    Cells are one screen pixel where the data extent fits in ``max_px``; wider
+    extents use proportionally coarser cells, so each zoom gets its own resolution.
+    """
+    x, y = mercator_pixels(lat, lon, zoom)
+    pad = 3 * radius_px
+    x0, y0 = x.min() - pad, y.min() - pad
+    cell = max(1.0, max(x.max() + pad - x0, y.max() + pad - y0) / max_px)
+    nx = int(np.ceil((x.max() + pad - x0) / cell))
+    ny = int(np.ceil((y.max() + pad - y0) / cell))
+    grid, _, _ = np.histogram2d(y, x, bins=[ny, nx], range=[[y0, y0 + ny * cell], [x0, x0 + nx * cell]],
+                                weights=np.asarray(weights, dtype=float))
+    grid = gaussian_blur(grid, radius_px / 2 / cell)
+    scale = TILE_PX * 2.0 ** zoom
+    to_lon = lambda px: float(px / scale * 360.0 - 180.0)
+    to_lat = lambda py: float(np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * py / scale)))))
+    return grid, (to_lat(y0 + ny * cell), to_lon(x0), to_lat(y0), to_lon(x0 + nx * cell))
+
+def render_density_png(grid, gradient=HEAT_GRADIENT, min_opacity=0.3):
+    """Colour a density grid through ``gradient`` into a PNG data URL; empty cells stay transparent"""
+    level = grid / grid.max() if grid.max() > 0 else grid
+    stops = [pos for pos, _ in gradient]
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(level, stops, [color[channel] for _, color in gradient])
+    alpha = np.where(level > 0.02, min_opacity + (1 - min_opacity) * level, 0.0)
+    rgba[..., 3] = (alpha * 255).astype(np.uint8)
+    return 'data:image/png;base64,' + base64.b64encode(write_png(rgba)).decode('ascii')
+
+def density_overlay(manhole_df, zoom, weighting='Condition', gradient=HEAT_GRADIENT):
+    """(PNG data URL, bounds) for the weighted manhole density, or None without points"""
+    if manhole_df.empty:
+        return None
+    grid, bounds = density_grid(manhole_df['latitude'], manhole_df['longitude'],
+                                DENSITY_WEIGHTS[weighting](manhole_df), zoom)
+    return render_density_png(grid, gradient), bounds
+
+@st.cache_data(max_entries=32)
+def load_density_overlay(version, manhole_key, zoom, weighting, gradient_name, _manhole_df):
+    """Density overlay per data version, filter state, zoom and weighting"""
+    gradient = HOT_GRADIENT if gradient_name == 'hot' else HEAT_GRADIENT
+    return density_overlay(_manhole_df, zoom, weighting, gradient)
+
+def create_folium_map(manhole_df, pipe_df, center_lat=12.9141, center_lon=74.8560, zoom_start=14,
+                      cells=None, heat_overlay=None, trace=None):
+    """Create interactive Folium map
+    
+    With ``cells`` (one level of ``build_grid_pyramid``) the manholes are drawn
+    as aggregated grid cells and pipes are left out. ``heat_overlay`` is a
+    precomputed ``density_overlay``; otherwise one is rendered from ``manhole_df``.
+    ``trace`` is a (manholes, pipes) pair highlighted in its own layer.
+    """
     
     m = folium.Map(
         location=[center_lat, center_lon],
@@ -485,40 +2091,27 @@ def create_folium_map(manhole_df, pipe_df, center_lat=12.9141, center_lon=74.856
     pipe_group = folium.FeatureGroup(name='Pipes', show=True).add_to(m)
     
     # Color mappings
-    condition_colors = {'Good': 'green', 'Fair': 'blue', 'Poor': 'orange', 'Broken': 'red', 'Unknown': 'gray'}
     material_colors = {'PVC': 'blue', 'Concrete': 'gray', 'Clay': 'brown', 'HDPE': 'green', 'Cast Iron': 'orange'}
     
-    # Add manhole markers
-    for idx, row in manhole_df.iterrows():
-        condition = str(row.get('condition', 'Unknown'))
-        color = condition_colors.get(condition, 'gray')
-        
-        # Create popup
-        popup_html = f"""
-        <div style="font-family: Arial; width: 250px;">
-            <h4 style="color: #1a5490; margin-bottom: 8px;">🔍 Manhole #{row['manhole_id']}</h4>
-            <hr style="margin: 5px 0; border-color: #eee;">
-            <p><strong>Condition:</strong> <span style="color: {color}; font-weight: bold;">{condition}</span></p>
-            <p><strong>Material:</strong> {row.get('material', 'N/A')}</p>
-            <p><strong>Cover Type:</strong> {row.get('cover_type', 'N/A')}</p>
-            <p><strong>Connections:</strong> {row.get('no_of_connections', 'N/A')}</p>
-            <p><strong>Zone:</strong> {row.get('zone', 'N/A')}</p>
-            <p><strong>Ward:</strong> {row.get('ward', 'N/A')}</p>
-            <hr style="margin: 8px 0;">
-            <p style="font-size: 0.9em;">
-                <strong>Coordinates:</strong><br>
-                Lat: {row['latitude']:.6f}<br>
-                Lon: {row['longitude']:.6f}
-            </p>
-        </div>
-        """
-        
-        folium.Marker(
-            location=[row['latitude'], row['longitude']],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=f"Manhole #{row['manhole_id']} - {condition}",
-            icon=folium.Icon(color=color, icon='info-circle', prefix='fa')
-        ).add_to(manhole_group)
+    # Add manhole markers (one typed-array payload; popups are built on click)
+    if cells is not None:
+        share = cells['critical'] / cells['count']
+        colors = np.select([share >= 0.25, share > 0], ['red', 'orange'], 'green')
+        radii = 6 + 3 * np.log2(cells['count'].to_numpy())
+        for lat, lon, count, critical, color, radius in zip(
+                cells['latitude'], cells['longitude'], cells['count'], cells['critical'], colors, radii):
+            folium.CircleMarker(
+                location=[lat, lon],
+                radius=float(radius),
+                color=color,
+                fill=True,
+                fill_color=color,
+                fill_opacity=0.6,
+                weight=1,
+                tooltip=f"{count:,} manholes - {critical:,} critical"
+            ).add_to(manhole_group)
+    else:
+        ManholeLayer(manhole_df).add_to(manhole_group)
     
     # Add pipes
     if not pipe_df.empty and 'start_latitude' in pipe_df.columns:
@@ -539,23 +2132,31 @@ def create_folium_map(manhole_df, pipe_df, center_lat=12.9141, center_lon=74.856
                     tooltip=f"Pipe #{row['pipe_id']}"
                 ).add_to(pipe_group)
     
-    # Add heatmap for critical areas
-    if 'condition' in manhole_df.columns:
-        heat_data = []
-        for idx, row in manhole_df.iterrows():
-            weight = 1.0
-            if row['condition'] == 'Poor':
-                weight = 2.0
-            elif row['condition'] == 'Broken':
-                weight = 3.0
-            heat_data.append([row['latitude'], row['longitude'], weight])
-        
-        HeatMap(heat_data, 
-               name="Critical Areas", 
-               min_opacity=0.3,
-               radius=15,
-               blur=10,
-               gradient={0.4: 'blue', 0.65: 'yellow', 1: 'red'}).add_to(m)
+    # Add heatmap for critical areas (pre-rendered raster)
+    if heat_overlay is None and 'condition' in manhole_df.columns:
+        heat_overlay = density_overlay(manhole_df, zoom_start)
+    if heat_overlay is not None:
+        image, (south, west, north, east) = heat_overlay
+        folium.raster_layers.ImageOverlay(
+            image=image,
+            bounds=[[south, west], [north, east]],
+            name="Critical Areas",
+            opacity=1.0,
+            interactive=False
+        ).add_to(m)
+    
+    # Traced subnetwork
+    if trace is not None:
+        trace_manholes, trace_pipes = trace
+        trace_group = folium.FeatureGroup(name='Trace', show=True).add_to(m)
+        if 'start_latitude' in trace_pipes.columns:
+            drawable = trace_pipes[trace_pipes['start_latitude'].notna() & trace_pipes['end_latitude'].notna()]
+            segments = np.stack([drawable[['start_latitude', 'start_longitude']].to_numpy(dtype=float),
+                                 drawable[['end_latitude', 'end_longitude']].to_numpy(dtype=float)], axis=1)
+            if len(segments):
+                folium.PolyLine(segments.round(6).tolist(), color='yellow', weight=6, opacity=0.9).add_to(trace_group)
+        if not trace_manholes.empty:
+            ManholeLayer(trace_manholes, radius=9).add_to(trace_group)
     
     # Layer control
     folium.LayerControl(collapsed=False).add_to(m)
@@ -565,83 +2166,188 @@ def create_folium_map(manhole_df, pipe_df, center_lat=12.9141, center_lon=74.856
     
     return m
 
-def create_pydeck_3d_map(manhole_df, pipe_df):
-    """Create 3D visualization"""
+TOPOLOGY_WEBGL_EDGES = 5000
+
+def edge_segments(pipe_df):
+    """Pipe end coordinates as NaN-separated x/y arrays, drawable as one line trace"""
+    gap = np.full(len(pipe_df), np.nan)
+    x = np.column_stack([pipe_df['start_longitude'].to_numpy(dtype=float), pipe_df['end_longitude'].to_numpy(dtype=float), gap]).ravel()
+    y = np.column_stack([pipe_df['start_latitude'].to_numpy(dtype=float), pipe_df['end_latitude'].to_numpy(dtype=float), gap]).ravel()
+    return x, y
+
+def create_topology_figure(manhole_df, pipe_df, edge_class='condition', webgl=False):
+    """Network topology with one line trace per edge class and one marker trace for manholes"""
+    scatter = go.Scattergl if webgl else go.Scatter
+    fig = go.Figure()
+    
+    # Add edges (pipes), grouped by class
+    if 'start_latitude' in pipe_df.columns:
+        edges = pipe_df[pipe_df['start_latitude'].notna() & pipe_df['end_latitude'].notna()]
+        classes = edges[edge_class].astype(str) if edge_class in edges.columns else pd.Series('Pipes', index=edges.index)
+        for label, group in edges.groupby(classes.to_numpy(), sort=True):
+            x, y = edge_segments(group)
+            fig.add_trace(scatter(
+                x=x,
+                y=y,
+                mode='lines',
+                line=dict(width=1, color=CONDITION_COLORS.get(label, 'rgb(100, 150, 255)')),
+                opacity=0.4,
+                hoverinfo='skip',
+                name=f"{label} pipes ({len(group):,})"
+            ))
     
-    # Manhole data
-    manhole_data = []
-    for idx, row in manhole_df.iterrows():
-        condition = str(row.get('condition', 'Unknown'))
-        if condition == 'Good':
-            color = [0, 255, 0, 200]
-        elif condition == 'Fair':
-            color = [0, 150, 255, 200]
-        elif condition == 'Poor':
-            color = [255, 165, 0, 200]
-        elif condition == 'Broken':
-            color = [255, 0, 0, 200]
-        else:
-            color = [128, 128, 128, 200]
-        
-        manhole_data.append({
-            'coordinates': [row['longitude'], row['latitude']],
-            'position': [row['longitude'], row['latitude'], -(row.get('depth', 2.5))],
-            'color': color,
-            'radius': 8,
-            'manhole_id': row['manhole_id'],
-            'condition': condition
-        })
+    # Add nodes (manholes), coloured by condition code through a stepped colorscale;
+    # numeric colours skip Plotly's per-point validation of colour strings
+    conditions = list(CONDITION_COLORS)
+    codes = pd.Categorical(manhole_df['condition'].astype(str), categories=conditions).codes
+    codes = np.where(codes < 0, conditions.index('Unknown'), codes)
+    steps = np.linspace(0, 1, len(conditions) + 1)
+    colorscale = [[float(edge), CONDITION_COLORS[c]] for i, c in enumerate(conditions) for edge in steps[i:i + 2]]
+    fig.add_trace(scatter(
+        x=manhole_df['longitude'],
+        y=manhole_df['latitude'],
+        mode='markers',
+        marker=dict(size=8, color=codes, colorscale=colorscale, cmin=-0.5, cmax=len(conditions) - 0.5,
+                    line=dict(width=1, color='white')),
+        text=manhole_df['manhole_id'],
+        hoverinfo='text',
+        name='Manholes'
+    ))
+    
+    fig.update_layout(
+        title='Network Topology',
+        showlegend=True,
+        plot_bgcolor='rgba(20,24,30,0.6)',
+        paper_bgcolor='rgba(11,11,11,0.98)',
+        font=dict(color='#e6eef6'),
+        height=600,
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
+    )
+    return fig
+
+# RGBA palettes for the 3D view; anything unlisted falls back to the default
+CONDITION_RGBA = {
+    'Good': [0, 255, 0, 200],
+    'Fair': [0, 150, 255, 200],
+    'Poor': [255, 165, 0, 200],
+    'Broken': [255, 0, 0, 200],
+    'Inaccessible': [160, 32, 240, 200]
+}
+MATERIAL_RGBA = {
+    'PVC': [0, 100, 255, 180],
+    'Concrete': [128, 128, 128, 180],
+    'RCC': [128, 128, 128, 180],
+    'Stoneware': [139, 69, 19, 180],
+    'Clay': [139, 69, 19, 180],
+    'HDPE': [50, 205, 50, 180]
+}
+DEFAULT_MANHOLE_DEPTH_M = 2.5
+
+def palette_rgba(series, palette, default):
+    """(n, 4) uint8 colours for ``series`` through a per-category palette lookup"""
+    values = pd.Categorical(series.astype(str))
+    table = np.array([palette.get(c, default) for c in values.categories] + [default], dtype=np.uint8)
+    return table[values.codes]
+
+def _rgba_columns(rgba):
+    return {'r': rgba[:, 0], 'g': rgba[:, 1], 'b': rgba[:, 2], 'a': rgba[:, 3]}
+
+class FrozenDeck(pdk.Deck):
+    """Deck whose JSON spec is serialized once; st.pydeck_chart re-serializes on every rerun otherwise"""
     
-    # Pipe data
-    pipe_data = []
-    for idx, row in pipe_df.iterrows():
-        if 'start_latitude' in row and pd.notna(row['start_latitude']):
-            material = str(row.get('material', 'PVC'))
-            if material == 'PVC':
-                color = [0, 100, 255, 180]
-            elif material == 'Concrete':
-                color = [128, 128, 128, 180]
-            elif material == 'Clay':
-                color = [139, 69, 19, 180]
-            elif material == 'HDPE':
-                color = [50, 205, 50, 180]
-            else:
-                color = [100, 100, 100, 180]
-            
-            start_depth = -(row.get('depth', 3.0))
-            end_depth = start_depth + np.random.uniform(-0.5, 0.5)
-            
-            pipe_data.append({
-                'start': [row['start_longitude'], row['start_latitude'], start_depth],
-                'end': [row['end_longitude'], row['end_latitude'], end_depth],
-                'color': color,
-                'width': 4,
-                'pipe_id': row.get('pipe_id', '')
-            })
+    def to_json(self):
+        if '_frozen_json' not in self.__dict__:
+            self._frozen_json = super().to_json()
+        return self._frozen_json
+
+def frame_key(df):
+    """Digest of which base-table rows ``df`` holds; frames here are row subsets of the cached tables"""
+    return hashlib.sha1(np.ascontiguousarray(df.index.to_numpy()).tobytes()).hexdigest()
+
+TRACE_RGBA = [255, 255, 0, 255]
+
+def pipe_segments_3d(pipe_df, fallback_depth, rgba=None):
+    """Columnar 3D segments for the pipes with resolved ends, coloured by material unless ``rgba`` is given"""
+    if 'start_latitude' not in pipe_df.columns:
+        return pd.DataFrame()
+    pipes = pipe_df[pipe_df['start_latitude'].notna() & pipe_df['end_latitude'].notna()]
+    start_depth = pipes['start_depth'] if 'start_depth' in pipes.columns else pipes['depth']
+    end_depth = pipes['end_depth'] if 'end_depth' in pipes.columns else start_depth
+    start_depth = start_depth.astype(float).fillna(fallback_depth)
+    colors = (np.tile(np.array(rgba, dtype=np.uint8), (len(pipes), 1)) if rgba is not None
+              else palette_rgba(pipes['material'], MATERIAL_RGBA, [100, 100, 100, 180]))
+    return pd.DataFrame({
+        'pipe_id': pipes['pipe_id'].astype(str).to_numpy(),
+        'material': pipes['material'].astype(str).to_numpy(),
+        'x0': pipes['start_longitude'].to_numpy(dtype=float).round(6),
+        'y0': pipes['start_latitude'].to_numpy(dtype=float).round(6),
+        'z0': -start_depth.round(2).to_numpy(),
+        'x1': pipes['end_longitude'].to_numpy(dtype=float).round(6),
+        'y1': pipes['end_latitude'].to_numpy(dtype=float).round(6),
+        'z1': -end_depth.astype(float).fillna(start_depth).round(2).to_numpy(),
+        **_rgba_columns(colors)
+    })
+
+def create_pydeck_3d_map(manhole_df, pipe_df, trace_pipes=None):
+    """Create 3D visualization from columnar frames (deterministic, so the deck can be cached)
+    
+    ``trace_pipes`` are drawn on top in TRACE_RGBA, for highlighting a network trace.
+    """
+    
+    # Manhole data
+    depth = manhole_df['depth'].astype(float) if 'depth' in manhole_df.columns else pd.Series(np.nan, index=manhole_df.index)
+    fallback = depth.median() if depth.notna().any() else DEFAULT_MANHOLE_DEPTH_M
+    manhole_data = pd.DataFrame({
+        'manhole_id': manhole_df['manhole_id'].astype(str).to_numpy(),
+        'condition': manhole_df['condition'].astype(str).to_numpy(),
+        'lon': manhole_df['longitude'].to_numpy(dtype=float).round(6),
+        'lat': manhole_df['latitude'].to_numpy(dtype=float).round(6),
+        'z': -depth.fillna(fallback).round(2).to_numpy(),
+        **_rgba_columns(palette_rgba(manhole_df['condition'], CONDITION_RGBA, [128, 128, 128, 200]))
+    })
+    
+    # Pipe data (pipes without resolved ends have nothing to draw)
+    pipe_data = pipe_segments_3d(pipe_df, fallback)
     
     # Create layers
     layers = []
     
-    if pipe_data:
+    if not pipe_data.empty:
         pipe_layer = pdk.Layer(
             'LineLayer',
             pipe_data,
-            get_source_position='start',
-            get_target_position='end',
-            get_color='color',
-            get_width='width',
+            id='pipes',
+            get_source_position='[x0, y0, z0]',
+            get_target_position='[x1, y1, z1]',
+            get_color='[r, g, b, a]',
+            get_width=4,
             pickable=True,
             auto_highlight=True
         )
         layers.append(pipe_layer)
     
-    if manhole_data:
+    trace_data = pipe_segments_3d(trace_pipes, fallback, TRACE_RGBA) if trace_pipes is not None else pd.DataFrame()
+    if not trace_data.empty:
+        layers.append(pdk.Layer(
+            'LineLayer',
+            trace_data,
+            id='trace',
+            get_source_position='[x0, y0, z0]',
+            get_target_position='[x1, y1, z1]',
+            get_color='[r, g, b, a]',
+            get_width=10,
+            pickable=True
+        ))
+    
+    if not manhole_data.empty:
         manhole_layer = pdk.Layer(
             'ScatterplotLayer',
             manhole_data,
-            get_position='position',
-            get_color='color',
-            get_radius='radius',
+            id='manholes',
+            get_position='[lon, lat, z]',
+            get_color='[r, g, b, a]',
+            get_radius=8,
             pickable=True,
             opacity=0.9,
             stroked=True,
@@ -651,8 +2357,8 @@ def create_pydeck_3d_map(manhole_df, pipe_df):
     
     # View state
     view_state = pdk.ViewState(
-        latitude=12.9141,
-        longitude=74.8560,
+        latitude=float(manhole_data['lat'].mean()) if not manhole_data.empty else BASE_LAT,
+        longitude=float(manhole_data['lon'].mean()) if not manhole_data.empty else BASE_LON,
         zoom=13,
         pitch=60,
         bearing=0,
@@ -660,7 +2366,7 @@ def create_pydeck_3d_map(manhole_df, pipe_df):
     )
     
     # Deck
-    deck = pdk.Deck(
+    deck = FrozenDeck(
         layers=layers,
         initial_view_state=view_state,
         tooltip={
@@ -677,10 +2383,175 @@ def create_pydeck_3d_map(manhole_df, pipe_df):
     
     return deck
 
+@st.cache_resource(max_entries=8)
+def load_pydeck_3d_map(version, manhole_key, pipe_key, trace_key, _manhole_df, _pipe_df, _trace_pipes=None):
+    """3D deck per data version, filter state and trace; the keys stand in for the unhashed frames"""
+    return create_pydeck_3d_map(_manhole_df, _pipe_df, _trace_pipes)
+
+# ============================================================================
+# RENDER CACHE
+# ============================================================================
+# Serialized figures and map HTML, shared by every session. Keys carry the data
+# version and the normalized filter state, so stale entries are never served;
+# they just age out of the LRU.
+RENDER_CACHE_BYTES = 256 * 1024 ** 2
+
+class RenderCache:
+    """Thread-safe LRU of rendered payloads (strings), bounded by total size in bytes"""
+    
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+    
+    def put(self, key, payload):
+        size = sys.getsizeof(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= sys.getsizeof(previous)
+            self._entries[key] = payload
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sys.getsizeof(evicted)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+@st.cache_resource
+def render_cache():
+    return RenderCache(RENDER_CACHE_BYTES)
+
+def normalize_filters(filters):
+    """Hashable, order-independent form of a filter dict; multiselect values are sorted"""
+    return tuple(sorted(
+        (name, tuple(sorted(map(str, value))) if isinstance(value, (list, tuple, set)) else str(value))
+        for name, value in filters.items()
+    ))
+
+def render_key(view, chart, scope, filters=None):
+    """(view, chart id, normalized filter tuple, data version) for one rendered chart.
+    
+    ``scope`` is the (data version, global filters) pair main() hands to every
+    view; ``filters`` holds the view's own widget state.
+    """
+    version, global_filters = scope
+    return (view, chart, normalize_filters({**global_filters, **(filters or {})}), version)
+
+def cached_plotly_chart(key, build, **kwargs):
+    """st.plotly_chart of ``build()``, served from the render cache when ``key`` was seen before"""
+    cache = render_cache()
+    payload = cache.get(key)
+    if payload is None:
+        payload = build().to_json()
+        cache.put(key, payload)
+    # The JSON came from a validated figure, so skip Plotly's (slow) re-validation
+    st.plotly_chart(go.Figure(json.loads(payload), _validate=False), **kwargs)
+
+def cached_folium_map(key, build, width=700, height=500):
+    """Static Folium map of ``build()`` (as folium_static renders it), with the page HTML cached"""
+    cache = render_cache()
+    html = cache.get(key)
+    if html is None:
+        html = folium.Figure().add_child(build()).render()
+        cache.put(key, html)
+    components.html(html, height=height + 10, width=width)
+
+# ============================================================================
+# PAGINATED TABLES
+# ============================================================================
+PAGE_SIZES = [25, 50, 100, 250]
+
+def paginated_table(table_index, positions, columns, key, sort_by, descending=False):
+    """Server-side paged table over the rows at ``positions`` of ``table_index``.
+    
+    Search, sorting, seeking and paging all work on row positions; only the
+    visible page is materialized and sent to the browser.
+    """
+    frame = table_index.frame
+    text_columns = [col for col in columns if not pd.api.types.is_numeric_dtype(frame[col])]
+    page_key, sought_key, shown_key = f'{key}_page', f'{key}_sought', f'{key}_shown'
+    
+    col1, col2, col3, col4, col5 = st.columns([2, 1, 1, 2, 3])
+    with col1:
+        sort_col = st.selectbox("Sort by", columns, index=columns.index(sort_by), key=f'{key}_sort')
+    with col2:
+        descending = st.checkbox("Descending", value=descending, key=f'{key}_descending')
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f'{key}_size')
+    with col4:
+        search_in = st.selectbox("Search in", ["All text columns"] + text_columns, key=f'{key}_search_in')
+    with col5:
+        query = st.text_input("🔎 Search", key=f'{key}_query', placeholder="IDs, roads, materials...")
+    
+    if query.strip() and text_columns:
+        matches = table_index.search(text_columns if search_in == "All text columns" else [search_in], query)
+        positions = positions[matches[positions]]
+    ordered = table_index.sorted_positions(positions, sort_col, descending)
+    pages = max(1, -(-len(ordered) // page_size))
+    # A new search, sort or page size starts again from the first page
+    shown = (query, search_in, sort_col, descending, page_size, len(ordered))
+    if st.session_state.get(shown_key) != shown:
+        st.session_state[shown_key] = shown
+        st.session_state[page_key] = 1
+    
+    col1, col2, col3, col4, col5 = st.columns([1, 2, 1, 3, 3])
+    with col4:
+        seek = st.text_input(f"Seek {sort_col}", key=f'{key}_seek', placeholder="Jump to a value")
+    # Seek once per entered value, so paging away from it afterwards sticks
+    if seek.strip() and st.session_state.get(sought_key) != (seek, sort_col, descending):
+        st.session_state[sought_key] = (seek, sort_col, descending)
+        target = table_index.seek_key(sort_col, seek, descending)
+        if target is not None:
+            keys = table_index.sort_keys(sort_col)[ordered]
+            row = np.searchsorted(-keys, -target) if descending else np.searchsorted(keys, target)
+            st.session_state[page_key] = int(row) // page_size + 1
+    st.session_state[page_key] = min(max(st.session_state.get(page_key, 1), 1), pages)
+    
+    def step(delta):
+        st.session_state[page_key] += delta
+    
+    with col1:
+        st.button("◀", key=f'{key}_prev', on_click=step, args=(-1,), disabled=st.session_state[page_key] <= 1)
+    with col2:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=page_key)
+    with col3:
+        st.button("▶", key=f'{key}_next', on_click=step, args=(1,), disabled=st.session_state[page_key] >= pages)
+    
+    start = (page - 1) * page_size
+    rows = ordered[start:start + page_size]
+    with col5:
+        st.caption(f"Rows {start + 1 if len(rows) else 0:,}–{start + len(rows):,} of {len(ordered):,}")
+    st.dataframe(frame[columns].iloc[rows], use_container_width=True, hide_index=True)
+
 # ============================================================================
 # VIEW 1: EXECUTIVE DASHBOARD
 # ============================================================================
-def executive_dashboard_view(manhole_df, pipe_df):
+# Views and map panels are fragments: a widget inside one reruns only that
+# fragment, with the arguments it was last called with, instead of the whole
+# script. Sidebar filters still rerun everything, so the arguments stay current.
+@st.fragment
+def executive_dashboard_view(manhole_df, pipe_df, manhole_cube, scope):
     """Main executive dashboard"""
     
     st.markdown("<h1 style='text-align: center; margin-bottom: 0.5rem;'>🏙️ MCC SEWER NETWORK DASHBOARD</h1>", unsafe_allow_html=True)
@@ -691,9 +2562,10 @@ def executive_dashboard_view(manhole_df, pipe_df):
     st.markdown("### 📊 EXECUTIVE SUMMARY - Key Metrics")
     col1, col2, col3, col4 = st.columns(4)
     
-    total_manholes = len(manhole_df)
+    totals = rollup(manhole_cube)
+    total_manholes = int(totals['count'])
     total_pipes = len(pipe_df)
-    avg_connections = manhole_df['no_of_connections'].mean() if 'no_of_connections' in manhole_df.columns else 0
+    avg_connections = totals['total_connections'] / total_manholes if 'total_connections' in totals and total_manholes > 0 else 0
     
     with col1:
         st.metric(
@@ -721,7 +2593,7 @@ def executive_dashboard_view(manhole_df, pipe_df):
     
     with col4:
         if 'condition' in manhole_df.columns:
-            critical = manhole_df[manhole_df['condition'].isin(['Poor', 'Broken'])].shape[0]
+            critical = int(rollup(manhole_cube, filters={'condition': ['Poor', 'Broken']})['count'])
             critical_pct = (critical / total_manholes * 100) if total_manholes > 0 else 0
             st.metric(
                 "⚠️ CRITICAL ASSETS", 
@@ -738,69 +2610,75 @@ def executive_dashboard_view(manhole_df, pipe_df):
     
     with col1:
         if 'condition' in manhole_df.columns:
-            condition_counts = manhole_df['condition'].value_counts().sort_values(ascending=True)
-            fig = px.bar(
-                y=condition_counts.index,
-                x=condition_counts.values,
-                orientation='h',
-                title="Manhole Condition Distribution",
-                color=condition_counts.values,
-                color_continuous_scale='RdYlGn_r',
-                labels={'x': 'Count', 'y': 'Condition'},
-                text=condition_counts.values
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(family="Arial", size=12, color='#e6eef6'),
-                showlegend=False,
-                height=400,
-                margin=dict(l=120, r=20, t=50, b=20)
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                condition_counts = rollup(manhole_cube, 'condition')['count'].sort_values(ascending=True)
+                fig = px.bar(
+                    y=condition_counts.index,
+                    x=condition_counts.values,
+                    orientation='h',
+                    title="Manhole Condition Distribution",
+                    color=condition_counts.values,
+                    color_continuous_scale='RdYlGn_r',
+                    labels={'x': 'Count', 'y': 'Condition'},
+                    text=condition_counts.values
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(family="Arial", size=12, color='#e6eef6'),
+                    showlegend=False,
+                    height=400,
+                    margin=dict(l=120, r=20, t=50, b=20)
+                )
+                fig.update_traces(textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('executive', 'manhole_condition_distribution', scope), build, use_container_width=True)
     
     with col2:
         if 'material' in manhole_df.columns:
-            material_counts = manhole_df['material'].value_counts()
-            fig = px.bar(
-                x=material_counts.index,
-                y=material_counts.values,
-                title="Material Composition",
-                color=material_counts.values,
-                color_continuous_scale='Blues',
-                labels={'x': 'Material Type', 'y': 'Count'},
-                text=material_counts.values
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(family="Arial", size=12, color='#e6eef6'),
-                showlegend=False,
-                height=400,
-                xaxis_tickangle=-45
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                material_counts = rollup(manhole_cube, 'material')['count'].sort_values(ascending=False)
+                fig = px.bar(
+                    x=material_counts.index,
+                    y=material_counts.values,
+                    title="Material Composition",
+                    color=material_counts.values,
+                    color_continuous_scale='Blues',
+                    labels={'x': 'Material Type', 'y': 'Count'},
+                    text=material_counts.values
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(family="Arial", size=12, color='#e6eef6'),
+                    showlegend=False,
+                    height=400,
+                    xaxis_tickangle=-45
+                )
+                fig.update_traces(textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('executive', 'material_composition', scope), build, use_container_width=True)
     
     with col3:
         if 'condition' in manhole_df.columns:
-            condition_counts = manhole_df['condition'].value_counts()
-            fig = px.pie(
-                values=condition_counts.values,
-                names=condition_counts.index,
-                title="Condition Ratio",
-                color_discrete_sequence=['#4caf50', '#ffc107', '#ff9800', '#f44336'],
-                hole=0.4
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(11,11,11,0.98)',
-                font=dict(family="Arial", size=11, color='#e6eef6'),
-                height=400,
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                condition_counts = rollup(manhole_cube, 'condition')['count'].sort_values(ascending=False)
+                fig = px.pie(
+                    values=condition_counts.values,
+                    names=condition_counts.index,
+                    title="Condition Ratio",
+                    color_discrete_sequence=['#4caf50', '#ffc107', '#ff9800', '#f44336'],
+                    hole=0.4
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(11,11,11,0.98)',
+                    font=dict(family="Arial", size=11, color='#e6eef6'),
+                    height=400,
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                )
+                return fig
+            cached_plotly_chart(render_key('executive', 'condition_ratio', scope), build, use_container_width=True)
     
     st.markdown("---")
     
@@ -810,40 +2688,48 @@ def executive_dashboard_view(manhole_df, pipe_df):
     
     with col1:
         if 'no_of_connections' in manhole_df.columns:
-            fig = px.histogram(
-                manhole_df,
-                x='no_of_connections',
-                nbins=20,
-                title="Connection Distribution",
-                color_discrete_sequence=['#1a5490'],
-                labels={'no_of_connections': 'Number of Connections', 'count': 'Frequency'}
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                connection_counts = rollup(manhole_cube, 'no_of_connections').reset_index()
+                fig = px.histogram(
+                    connection_counts,
+                    x='no_of_connections',
+                    y='count',
+                    histfunc='sum',
+                    nbins=20,
+                    title="Connection Distribution",
+                    color_discrete_sequence=['#1a5490'],
+                    labels={'no_of_connections': 'Number of Connections'}
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    yaxis_title="Frequency",
+                    showlegend=False
+                )
+                return fig
+            cached_plotly_chart(render_key('executive', 'connection_distribution', scope), build, use_container_width=True)
     
     with col2:
         if 'cover_type' in manhole_df.columns:
-            cover_counts = manhole_df['cover_type'].value_counts()
-            fig = px.pie(
-                values=cover_counts.values,
-                names=cover_counts.index,
-                title="Cover Type Distribution",
-                color_discrete_sequence=px.colors.sequential.Viridis,
-                hole=0.3
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(11,11,11,0.98)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                cover_counts = rollup(manhole_cube, 'cover_type')['count'].sort_values(ascending=False)
+                fig = px.pie(
+                    values=cover_counts.values,
+                    names=cover_counts.index,
+                    title="Cover Type Distribution",
+                    color_discrete_sequence=px.colors.sequential.Viridis,
+                    hole=0.3
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(11,11,11,0.98)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                return fig
+            cached_plotly_chart(render_key('executive', 'cover_type_distribution', scope), build, use_container_width=True)
     
     st.markdown("---")
     
@@ -874,28 +2760,30 @@ def executive_dashboard_view(manhole_df, pipe_df):
     st.markdown("---")
     st.markdown("### 🗺️ NETWORK OVERVIEW")
     
-    try:
-        # Calculate center
-        center_lat = manhole_df['latitude'].mean()
-        center_lon = manhole_df['longitude'].mean()
-        
-        # Create simple preview map
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=13, tiles='CartoDB dark_matter')
-        
-        # Add sample markers
-        sample_data = manhole_df.head(50)
-        for idx, row in sample_data.iterrows():
-            color = 'green' if row.get('condition') == 'Good' else 'red' if row.get('condition') in ['Poor', 'Broken'] else 'blue'
-            folium.CircleMarker(
-                location=[row['latitude'], row['longitude']],
-                radius=4,
-                color=color,
-                fill=True,
-                fill_color=color
-            ).add_to(m)
+    try:
+        def build():
+            # Calculate center
+            center_lat = manhole_df['latitude'].mean()
+            center_lon = manhole_df['longitude'].mean()
+            
+            # Create simple preview map
+            m = folium.Map(location=[center_lat, center_lon], zoom_start=13, tiles='CartoDB dark_matter')
+            
+            # Add sample markers
+            sample_data = manhole_df.head(50)
+            for idx, row in sample_data.iterrows():
+                color = 'green' if row.get('condition') == 'Good' else 'red' if row.get('condition') in ['Poor', 'Broken'] else 'blue'
+                folium.CircleMarker(
+                    location=[row['latitude'], row['longitude']],
+                    radius=4,
+                    color=color,
+                    fill=True,
+                    fill_color=color
+                ).add_to(m)
+            return m
         
         # Display map
-        folium_static(m, width=1000, height=400)
+        cached_folium_map(render_key('executive', 'network_overview', scope), build, width=1000, height=400)
         
     except Exception as e:
         st.info("Map preview available in Geospatial view")
@@ -903,7 +2791,8 @@ def executive_dashboard_view(manhole_df, pipe_df):
 # ============================================================================
 # VIEW 2: MANHOLE CONDITION & RISK ANALYSIS
 # ============================================================================
-def manhole_condition_view(manhole_df):
+@st.fragment
+def manhole_condition_view(manhole_df, manhole_index, manhole_scope, manhole_cube, scope):
     """Detailed manhole condition analysis"""
     
     st.markdown("<h1 style='text-align: center;'>🔍 MANHOLE CONDITION & RISK ASSESSMENT</h1>", unsafe_allow_html=True)
@@ -949,39 +2838,38 @@ def manhole_condition_view(manhole_df):
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Apply filters
-    filtered_df = manhole_df.copy()
-    if conditions:
-        filtered_df = filtered_df[filtered_df['condition'].isin(conditions)]
-    if materials:
-        filtered_df = filtered_df[filtered_df['material'].isin(materials)]
-    if wards:
-        filtered_df = filtered_df[filtered_df['ward'].isin(wards)]
-    if 'no_of_connections' in filtered_df.columns:
-        filtered_df = filtered_df[
-            (filtered_df['no_of_connections'] >= min_conn) & 
-            (filtered_df['no_of_connections'] <= max_conn)
-        ]
+    selections = {
+        'condition': conditions,
+        'material': materials,
+        'ward': wards,
+        'no_of_connections': range(min_conn, max_conn + 1) if 'no_of_connections' in manhole_df.columns else None
+    }
+    filtered_bits = manhole_index.select(selections, base=manhole_scope)
+    filtered_df = manhole_index.take(filtered_bits)
+    filtered_totals = rollup(manhole_cube, filters=selections)
+    filtered_count = int(filtered_totals['count'])
     
     # Summary Metrics
     st.markdown("### 📊 FILTERED RESULTS")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Manholes", len(filtered_df), delta=f"{len(filtered_df)/len(manhole_df)*100:.1f}% of total")
+        st.metric("Total Manholes", filtered_count, delta=f"{filtered_count/len(manhole_df)*100:.1f}% of total")
     
     with col2:
         if 'condition' in filtered_df.columns:
-            critical = filtered_df[filtered_df['condition'].isin(['Poor', 'Broken'])].shape[0]
-            st.metric("Critical Assets", critical, delta=f"{critical/len(filtered_df)*100:.1f}%" if len(filtered_df) > 0 else "0%")
+            condition_counts = rollup(manhole_cube, 'condition', selections)['count']
+            critical = int(condition_counts.reindex(['Poor', 'Broken'], fill_value=0).sum())
+            st.metric("Critical Assets", critical, delta=f"{critical/filtered_count*100:.1f}%" if filtered_count > 0 else "0%")
     
     with col3:
         if 'no_of_connections' in filtered_df.columns:
-            avg_conn = filtered_df['no_of_connections'].mean()
+            avg_conn = filtered_totals['total_connections'] / filtered_count if filtered_count else float('nan')
             st.metric("Avg Connections", f"{avg_conn:.1f}")
     
     with col4:
         if 'material' in filtered_df.columns:
-            unique_materials = filtered_df['material'].nunique()
+            unique_materials = len(rollup(manhole_cube, 'material', selections))
             st.metric("Material Types", unique_materials)
     
     st.markdown("---")
@@ -992,97 +2880,103 @@ def manhole_condition_view(manhole_df):
     
     with col1:
         if 'condition' in filtered_df.columns:
-            # Condition by Material
-            condition_material = pd.crosstab(filtered_df['condition'], filtered_df['material'])
-            fig = px.bar(
-                condition_material,
-                title="Condition by Material",
-                barmode='group',
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                xaxis_title="Condition",
-                yaxis_title="Count",
-                legend_title="Material"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Condition by Material
+                condition_material = rollup(manhole_cube, ['condition', 'material'], selections)['count'].unstack(fill_value=0)
+                fig = px.bar(
+                    condition_material,
+                    title="Condition by Material",
+                    barmode='group',
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    xaxis_title="Condition",
+                    yaxis_title="Count",
+                    legend_title="Material"
+                )
+                return fig
+            cached_plotly_chart(render_key('manhole_condition', 'condition_by_material', scope, selections), build, use_container_width=True)
     
     with col2:
         if 'condition' in filtered_df.columns and 'ward' in filtered_df.columns:
-            # Condition by Ward
-            condition_ward = pd.crosstab(filtered_df['ward'], filtered_df['condition'])
-            fig = px.bar(
-                condition_ward,
-                title="Condition by Ward",
-                barmode='stack',
-                color_discrete_sequence=['#4caf50', '#ffc107', '#ff9800', '#f44336']
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                xaxis_title="Ward",
-                yaxis_title="Count",
-                legend_title="Condition"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Condition by Ward
+                condition_ward = rollup(manhole_cube, ['ward', 'condition'], selections)['count'].unstack(fill_value=0)
+                fig = px.bar(
+                    condition_ward,
+                    title="Condition by Ward",
+                    barmode='stack',
+                    color_discrete_sequence=['#4caf50', '#ffc107', '#ff9800', '#f44336']
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    xaxis_title="Ward",
+                    yaxis_title="Count",
+                    legend_title="Condition"
+                )
+                return fig
+            cached_plotly_chart(render_key('manhole_condition', 'condition_by_ward', scope, selections), build, use_container_width=True)
     
     st.markdown("---")
     
     # Risk Scoring
     st.markdown("### ⚠️ RISK ASSESSMENT MATRIX")
     
-    if 'condition' in filtered_df.columns and 'no_of_connections' in filtered_df.columns:
-        # Create risk categories
-        def calculate_risk(row):
-            condition_score = {'Good': 1, 'Fair': 2, 'Poor': 3, 'Broken': 4}.get(row.get('condition', 'Fair'), 2)
-            connection_score = min(row.get('no_of_connections', 0) / 5, 3)  # Scale to 0-3
-            return condition_score + connection_score
-        
-        filtered_df['risk_score'] = filtered_df.apply(calculate_risk, axis=1)
-        filtered_df['risk_category'] = pd.cut(
-            filtered_df['risk_score'],
-            bins=[0, 2, 4, 6, 8],
-            labels=['Low', 'Medium', 'High', 'Critical']
-        )
-        
+    if 'risk_category' in filtered_df.columns:
+        # Scores are precomputed at load time; filters only slice them
         # Risk Distribution
-        risk_counts = filtered_df['risk_category'].value_counts().sort_index()
+        risk_counts = rollup(manhole_cube, 'risk_category', selections)['count'].reindex(RISK_LABELS, fill_value=0)
         
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            colors = ['#4caf50', '#ffc107', '#ff9800', '#f44336']
-            fig = px.bar(
-                x=risk_counts.index,
-                y=risk_counts.values,
-                title="Risk Category Distribution",
-                color=risk_counts.index,
-                color_discrete_sequence=colors,
-                text=risk_counts.values
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                showlegend=False,
-                xaxis_title="Risk Category",
-                yaxis_title="Count"
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                colors = ['#4caf50', '#ffc107', '#ff9800', '#f44336']
+                fig = px.bar(
+                    x=risk_counts.index,
+                    y=risk_counts.values,
+                    title="Risk Category Distribution",
+                    color=risk_counts.index,
+                    color_discrete_sequence=colors,
+                    text=risk_counts.values
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    showlegend=False,
+                    xaxis_title="Risk Category",
+                    yaxis_title="Count"
+                )
+                fig.update_traces(textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('manhole_condition', 'risk_category_distribution', scope, selections), build, use_container_width=True)
         
         with col2:
             st.markdown("### 🎯 RISK BREAKDOWN")
             for category, count in risk_counts.items():
-                percentage = (count / len(filtered_df)) * 100
+                percentage = (count / filtered_count) * 100 if filtered_count else 0
                 st.metric(f"{category} Risk", f"{count}", f"{percentage:.1f}%")
+        
+        if 'criticality' in filtered_df.columns:
+            # Ties on condition and connections are broken by how much of the network depends on the asset
+            st.markdown("### 🎯 PRIORITY RANKING")
+            ranking_cols = ['manhole_id', 'road', 'ward', 'condition', 'risk_category', 'risk_score',
+                            'criticality', 'upstream_assets', 'upstream_length_m', 'betweenness']
+            ranked = filtered_df.nlargest(15, ['risk_score', 'criticality'])
+            st.dataframe(
+                ranked[[col for col in ranking_cols if col in ranked.columns]].round(2),
+                use_container_width=True,
+                hide_index=True
+            )
     
     st.markdown("---")
     
@@ -1090,17 +2984,14 @@ def manhole_condition_view(manhole_df):
     st.markdown("### 📋 DETAILED MANHOLE INVENTORY")
     
     display_cols = ['manhole_id', 'road', 'ward', 'zone', 'condition', 'material', 
-                   'cover_type', 'no_of_connections', 'elevation', 'depth']
+                   'cover_type', 'no_of_connections', 'elevation', 'depth', 'criticality']
     available_cols = [col for col in display_cols if col in filtered_df.columns]
     
     if 'risk_category' in filtered_df.columns:
         available_cols.append('risk_category')
     
-    st.dataframe(
-        filtered_df[available_cols].sort_values('condition', ascending=False),
-        use_container_width=True,
-        height=400
-    )
+    paginated_table(table_index_for(manhole_index), manhole_index.positions(filtered_bits),
+                    available_cols, 'manhole_inventory', sort_by='condition', descending=True)
     
     # Export button
     if st.button("📥 Export Filtered Data", use_container_width=True):
@@ -1116,34 +3007,36 @@ def manhole_condition_view(manhole_df):
 # ============================================================================
 # VIEW 3: MATERIAL & COVER ANALYSIS
 # ============================================================================
-def material_cover_view(manhole_df):
+@st.fragment
+def material_cover_view(manhole_df, manhole_cube, scope):
     """Material and cover type analysis"""
     
     st.markdown("<h1 style='text-align: center;'>🏗️ MATERIAL & COVER ANALYSIS</h1>", unsafe_allow_html=True)
     st.markdown("<h4 style='text-align: center; color: #2e7ab5;'>Material Composition & Infrastructure Quality</h4>", unsafe_allow_html=True)
     st.markdown("---")
     
+    material_counts = rollup(manhole_cube, 'material')['count'] if 'material' in manhole_df.columns else pd.Series(dtype=int)
+    cover_counts = rollup(manhole_cube, 'cover_type')['count'] if 'cover_type' in manhole_df.columns else pd.Series(dtype=int)
+    
     # Quick Stats
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         if 'material' in manhole_df.columns:
-            unique_materials = manhole_df['material'].nunique()
-            st.metric("Material Types", unique_materials)
+            st.metric("Material Types", len(material_counts))
     
     with col2:
         if 'cover_type' in manhole_df.columns:
-            unique_covers = manhole_df['cover_type'].nunique()
-            st.metric("Cover Types", unique_covers)
+            st.metric("Cover Types", len(cover_counts))
     
     with col3:
         if 'material' in manhole_df.columns:
-            most_common = manhole_df['material'].mode()[0] if not manhole_df['material'].mode().empty else 'N/A'
+            most_common = material_counts.idxmax() if not material_counts.empty else 'N/A'
             st.metric("Most Common Material", most_common)
     
     with col4:
         if 'cover_type' in manhole_df.columns:
-            most_common_cover = manhole_df['cover_type'].mode()[0] if not manhole_df['cover_type'].mode().empty else 'N/A'
+            most_common_cover = cover_counts.idxmax() if not cover_counts.empty else 'N/A'
             st.metric("Most Common Cover", most_common_cover)
     
     st.markdown("---")
@@ -1154,46 +3047,50 @@ def material_cover_view(manhole_df):
     
     with col1:
         if 'material' in manhole_df.columns:
-            material_counts = manhole_df['material'].value_counts()
-            fig = px.bar(
-                x=material_counts.index,
-                y=material_counts.values,
-                title="Manhole Count by Material",
-                color=material_counts.values,
-                color_continuous_scale='Viridis',
-                text=material_counts.values
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                xaxis_tickangle=-45,
-                showlegend=False
-            )
-            fig.update_traces(textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                sorted_counts = material_counts.sort_values(ascending=False)
+                fig = px.bar(
+                    x=sorted_counts.index,
+                    y=sorted_counts.values,
+                    title="Manhole Count by Material",
+                    color=sorted_counts.values,
+                    color_continuous_scale='Viridis',
+                    text=sorted_counts.values
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    xaxis_tickangle=-45,
+                    showlegend=False
+                )
+                fig.update_traces(textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('material_cover', 'manhole_count_by_material', scope), build, use_container_width=True)
     
     with col2:
         if 'material' in manhole_df.columns and 'condition' in manhole_df.columns:
-            # Material vs Condition
-            crosstab = pd.crosstab(manhole_df['material'], manhole_df['condition'])
-            fig = px.bar(
-                crosstab,
-                title="Material Performance by Condition",
-                barmode='stack',
-                color_discrete_sequence=px.colors.qualitative.Set2
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                xaxis_title="Material",
-                yaxis_title="Count",
-                legend_title="Condition"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Material vs Condition
+                crosstab = rollup(manhole_cube, ['material', 'condition'])['count'].unstack(fill_value=0)
+                fig = px.bar(
+                    crosstab,
+                    title="Material Performance by Condition",
+                    barmode='stack',
+                    color_discrete_sequence=px.colors.qualitative.Set2
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    xaxis_title="Material",
+                    yaxis_title="Count",
+                    legend_title="Condition"
+                )
+                return fig
+            cached_plotly_chart(render_key('material_cover', 'material_performance_by_condition', scope), build, use_container_width=True)
     
     st.markdown("---")
     
@@ -1203,39 +3100,43 @@ def material_cover_view(manhole_df):
     
     with col1:
         if 'cover_type' in manhole_df.columns:
-            cover_counts = manhole_df['cover_type'].value_counts()
-            fig = px.pie(
-                values=cover_counts.values,
-                names=cover_counts.index,
-                title="Cover Type Distribution",
-                color_discrete_sequence=px.colors.sequential.Plasma,
-                hole=0.3
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(11,11,11,0.98)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                sorted_counts = cover_counts.sort_values(ascending=False)
+                fig = px.pie(
+                    values=sorted_counts.values,
+                    names=sorted_counts.index,
+                    title="Cover Type Distribution",
+                    color_discrete_sequence=px.colors.sequential.Plasma,
+                    hole=0.3
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(11,11,11,0.98)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                return fig
+            cached_plotly_chart(render_key('material_cover', 'cover_type_distribution', scope), build, use_container_width=True)
     
     with col2:
         if 'cover_type' in manhole_df.columns and 'material' in manhole_df.columns:
-            # Cover Type vs Material
-            crosstab = pd.crosstab(manhole_df['cover_type'], manhole_df['material'])
-            fig = px.imshow(
-                crosstab,
-                title="Cover Type vs Material Matrix",
-                color_continuous_scale='Blues',
-                labels=dict(x="Material", y="Cover Type", color="Count")
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Cover Type vs Material
+                crosstab = rollup(manhole_cube, ['cover_type', 'material'])['count'].unstack(fill_value=0)
+                fig = px.imshow(
+                    crosstab,
+                    title="Cover Type vs Material Matrix",
+                    color_continuous_scale='Blues',
+                    labels=dict(x="Material", y="Cover Type", color="Count")
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                return fig
+            cached_plotly_chart(render_key('material_cover', 'cover_type_vs_material_matrix', scope), build, use_container_width=True)
     
     st.markdown("---")
     
@@ -1243,53 +3144,42 @@ def material_cover_view(manhole_df):
     st.markdown("### 📈 MATERIAL PERFORMANCE METRICS")
     
     if 'material' in manhole_df.columns and 'condition' in manhole_df.columns:
-        # Calculate performance metrics
-        performance_data = []
-        
-        for material in manhole_df['material'].unique():
-            material_df = manhole_df[manhole_df['material'] == material]
-            total = len(material_df)
-            good_count = len(material_df[material_df['condition'] == 'Good'])
-            poor_count = len(material_df[material_df['condition'].isin(['Poor', 'Broken'])])
-            
-            performance_data.append({
-                'Material': material,
-                'Total Count': total,
-                'Good Condition %': (good_count / total * 100) if total > 0 else 0,
-                'Poor/Broken %': (poor_count / total * 100) if total > 0 else 0,
-                'Avg Connections': material_df['no_of_connections'].mean() if 'no_of_connections' in material_df.columns else 0
-            })
-        
-        performance_df = pd.DataFrame(performance_data)
+        performance_df = performance_metrics(manhole_cube, 'material', label='Material')
         
         # Display metrics
         col1, col2 = st.columns(2)
         
         with col1:
-            fig = px.bar(
-                performance_df.sort_values('Good Condition %', ascending=True),
-                y='Material',
-                x='Good Condition %',
-                title="Material Performance (Good Condition %)",
-                color='Good Condition %',
-                color_continuous_scale='RdYlGn',
-                orientation='h',
-                text='Good Condition %'
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                chart_df = performance_df.sort_values('Good Condition %', ascending=True)
+                fig = px.bar(
+                    chart_df,
+                    y='Material',
+                    x='Good Condition %',
+                    title="Material Performance (Good Condition %)",
+                    color='Good Condition %',
+                    color_continuous_scale='RdYlGn',
+                    orientation='h',
+                    text='Good Condition %',
+                    error_x=chart_df['Good CI High %'] - chart_df['Good Condition %'],
+                    error_x_minus=chart_df['Good Condition %'] - chart_df['Good CI Low %']
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('material_cover', 'material_performance_good_condition', scope), build, use_container_width=True)
         
         with col2:
             st.dataframe(
-                performance_df.sort_values('Good Condition %', ascending=False),
+                performance_df.sort_values('Good Condition %', ascending=False).round(1),
                 use_container_width=True,
-                height=400
+                height=400,
+                hide_index=True
             )
     
     # Recommendations
@@ -1339,7 +3229,8 @@ def material_cover_view(manhole_df):
 # ============================================================================
 # VIEW 4: PIPE NETWORK & CONNECTIONS
 # ============================================================================
-def pipe_network_view(pipe_df, manhole_df):
+@st.fragment
+def pipe_network_view(pipe_df, manhole_df, pipe_index, pipe_scope, pipe_cube, scope):
     """Pipe network analysis"""
     
     st.markdown("<h1 style='text-align: center;'>🔗 PIPE NETWORK & CONNECTIONS</h1>", unsafe_allow_html=True)
@@ -1354,19 +3245,26 @@ def pipe_network_view(pipe_df, manhole_df):
         st.metric("Total Pipes", f"{total_pipes:,}")
     
     with col2:
-        total_length = pipe_df['length'].sum() if 'length' in pipe_df.columns else 0
+        total_length = rollup(pipe_cube).get('total_length', 0)
         st.metric("Total Length", f"{total_length:,.0f} m")
     
     with col3:
         if 'material' in pipe_df.columns:
-            unique_materials = pipe_df['material'].nunique()
+            unique_materials = len(rollup(pipe_cube, 'material'))
             st.metric("Material Types", unique_materials)
     
     with col4:
         if 'diameter' in pipe_df.columns:
-            unique_diameters = pipe_df['diameter'].nunique()
+            unique_diameters = len(rollup(pipe_cube, 'diameter'))
             st.metric("Diameter Types", unique_diameters)
     
+    # Topology integrity
+    dangling = dangling_references(pipe_df, manhole_df)
+    if not dangling.empty:
+        st.warning(f"⚠️ **{len(dangling)} pipes reference manholes missing from the survey** - they are excluded from maps, connectivity, criticality and traces")
+        with st.expander("🔎 DANGLING REFERENCES"):
+            st.dataframe(dangling, use_container_width=True, height=250)
+    
     st.markdown("---")
     
     # Filters
@@ -1402,31 +3300,33 @@ def pipe_network_view(pipe_df, manhole_df):
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Apply filters
-    filtered_pipes = pipe_df.copy()
-    if 'material' in pipe_df.columns and selected_materials:
-        filtered_pipes = filtered_pipes[filtered_pipes['material'].isin(selected_materials)]
-    if 'diameter' in pipe_df.columns and selected_diameters:
-        filtered_pipes = filtered_pipes[filtered_pipes['diameter'].isin(selected_diameters)]
-    if 'layer' in pipe_df.columns and selected_layers:
-        filtered_pipes = filtered_pipes[filtered_pipes['layer'].isin(selected_layers)]
+    selections = {
+        'material': selected_materials if 'material' in pipe_df.columns else None,
+        'diameter': selected_diameters if 'diameter' in pipe_df.columns else None,
+        'layer': selected_layers if 'layer' in pipe_df.columns else None
+    }
+    filtered_bits = pipe_index.select(selections, base=pipe_scope)
+    filtered_pipes = pipe_index.take(filtered_bits)
+    filtered_totals = rollup(pipe_cube, filters=selections)
+    filtered_count = int(filtered_totals['count'])
     
     # Summary of filtered results
     st.markdown("### 📊 FILTERED PIPE NETWORK")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Filtered Pipes", len(filtered_pipes), f"{len(filtered_pipes)/len(pipe_df)*100:.1f}%")
+        st.metric("Filtered Pipes", filtered_count, f"{filtered_count/len(pipe_df)*100 if len(pipe_df) else 0:.1f}%")
     
     with col2:
-        filtered_length = filtered_pipes['length'].sum() if 'length' in filtered_pipes.columns else 0
+        filtered_length = filtered_totals.get('total_length', 0)
         st.metric("Filtered Length", f"{filtered_length:,.0f} m")
     
     with col3:
-        avg_length = filtered_pipes['length'].mean() if 'length' in filtered_pipes.columns and len(filtered_pipes) > 0 else 0
+        avg_length = filtered_length / filtered_count if filtered_count > 0 else 0
         st.metric("Avg Length", f"{avg_length:.1f} m")
     
     with col4:
-        max_length = filtered_pipes['length'].max() if 'length' in filtered_pipes.columns and len(filtered_pipes) > 0 else 0
+        max_length = filtered_totals.get('max_length', 0) if filtered_count > 0 else 0
         st.metric("Max Length", f"{max_length:.1f} m")
     
     st.markdown("---")
@@ -1437,56 +3337,60 @@ def pipe_network_view(pipe_df, manhole_df):
     
     with col1:
         if 'material' in filtered_pipes.columns:
-            material_stats = filtered_pipes.groupby('material').agg({
-                'length': ['sum', 'mean', 'count']
-            }).round(1)
-            material_stats.columns = ['Total Length', 'Avg Length', 'Count']
-            material_stats = material_stats.sort_values('Total Length', ascending=False)
+            def build():
+                material_stats = rollup(pipe_cube, 'material', selections)
+                material_stats = pd.DataFrame({
+                    'Total Length': material_stats['total_length'],
+                    'Avg Length': material_stats['total_length'] / material_stats['count'],
+                    'Count': material_stats['count']
+                }).round(1)
+                material_stats = material_stats.sort_values('Total Length', ascending=False)
             
-            fig = px.bar(
-                material_stats,
-                y=material_stats.index,
-                x='Total Length',
-                title="Total Pipe Length by Material",
-                color='Total Length',
-                color_continuous_scale='Blues',
-                orientation='h',
-                text='Total Length'
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                yaxis_title="Material",
-                xaxis_title="Total Length (m)"
-            )
-            fig.update_traces(texttemplate='%{text:,.0f}m', textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
+                fig = px.bar(
+                    material_stats,
+                    y=material_stats.index,
+                    x='Total Length',
+                    title="Total Pipe Length by Material",
+                    color='Total Length',
+                    color_continuous_scale='Blues',
+                    orientation='h',
+                    text='Total Length'
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    yaxis_title="Material",
+                    xaxis_title="Total Length (m)"
+                )
+                fig.update_traces(texttemplate='%{text:,.0f}m', textposition='outside')
+                return fig
+            cached_plotly_chart(render_key('pipe_network', 'total_pipe_length_by_material', scope, selections), build, use_container_width=True)
     
     with col2:
         if 'diameter' in filtered_pipes.columns:
-            diameter_stats = filtered_pipes.groupby('diameter').agg({
-                'length': ['sum', 'count']
-            }).round(1)
-            diameter_stats.columns = ['Total Length', 'Count']
-            diameter_stats = diameter_stats.sort_values('Total Length', ascending=False)
+            def build():
+                diameter_stats = rollup(pipe_cube, 'diameter', selections)[['total_length', 'count']].round(1)
+                diameter_stats.columns = ['Total Length', 'Count']
+                diameter_stats = diameter_stats.sort_values('Total Length', ascending=False)
             
-            fig = px.pie(
-                diameter_stats,
-                values='Total Length',
-                names=diameter_stats.index,
-                title="Pipe Length Distribution by Diameter",
-                hole=0.3,
-                color_discrete_sequence=px.colors.sequential.RdBu
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(11,11,11,0.98)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
+                fig = px.pie(
+                    diameter_stats,
+                    values='Total Length',
+                    names=diameter_stats.index,
+                    title="Pipe Length Distribution by Diameter",
+                    hole=0.3,
+                    color_discrete_sequence=px.colors.sequential.RdBu
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(11,11,11,0.98)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                return fig
+            cached_plotly_chart(render_key('pipe_network', 'pipe_length_distribution_by_diameter', scope, selections), build, use_container_width=True)
     
     st.markdown("---")
     
@@ -1497,95 +3401,103 @@ def pipe_network_view(pipe_df, manhole_df):
     
     with col1:
         if 'length' in filtered_pipes.columns:
-            # Length distribution
-            fig = px.histogram(
-                filtered_pipes,
-                x='length',
-                nbins=30,
-                title="Pipe Length Distribution",
-                color_discrete_sequence=['#1a5490'],
-                labels={'length': 'Length (m)', 'count': 'Frequency'}
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Length distribution, from the cube's LENGTH_BIN_M buckets
+                length_counts = rollup(pipe_cube, 'length_bin', selections).reset_index()
+                fig = px.histogram(
+                    length_counts,
+                    x='length_bin',
+                    y='count',
+                    histfunc='sum',
+                    nbins=30,
+                    title="Pipe Length Distribution",
+                    color_discrete_sequence=['#1a5490'],
+                    labels={'length_bin': 'Length (m)'}
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400,
+                    yaxis_title="Frequency",
+                    showlegend=False
+                )
+                return fig
+            cached_plotly_chart(render_key('pipe_network', 'pipe_length_distribution', scope, selections), build, use_container_width=True)
     
     with col2:
         if 'material' in filtered_pipes.columns and 'diameter' in filtered_pipes.columns:
-            # Material vs Diameter
-            crosstab = pd.crosstab(filtered_pipes['material'], filtered_pipes['diameter'])
-            fig = px.imshow(
-                crosstab,
-                title="Material vs Diameter Matrix",
-                color_continuous_scale='Viridis',
-                labels=dict(x="Diameter", y="Material", color="Count")
-            )
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6'),
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            def build():
+                # Material vs Diameter
+                crosstab = rollup(pipe_cube, ['material', 'diameter'], selections)['count'].unstack(fill_value=0)
+                fig = px.imshow(
+                    crosstab,
+                    title="Material vs Diameter Matrix",
+                    color_continuous_scale='Viridis',
+                    labels=dict(x="Diameter", y="Material", color="Count")
+                )
+                fig.update_layout(
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6'),
+                    height=400
+                )
+                return fig
+            cached_plotly_chart(render_key('pipe_network', 'material_vs_diameter_matrix', scope, selections), build, use_container_width=True)
     
     st.markdown("---")
     
     # Network Connectivity
     st.markdown("### 🌐 NETWORK CONNECTIVITY")
     
-    if 'connected_manholes' in filtered_pipes.columns and not manhole_df.empty:
-        # Calculate connectivity metrics
-        connectivity_data = []
-        for pipe in filtered_pipes['connected_manholes']:
-            if isinstance(pipe, str) and '-' in pipe:
-                start, end = pipe.split('-')
-                connectivity_data.append({'start': start, 'end': end})
+    if 'upstream_mh' in filtered_pipes.columns and not manhole_df.empty:
+        # Connectivity over the resolved pipes in view, from the cached graph (edge i = pipe row i)
+        graph = load_sewer_graph(pipe_index.key[1])
+        resolved_pipes = filtered_pipes[~filtered_pipes['is_dangling']] if 'is_dangling' in filtered_pipes.columns else filtered_pipes
+        edges = pipe_index.frame.index.get_indexer(resolved_pipes.index)
         
-        if connectivity_data:
-            connectivity_df = pd.DataFrame(connectivity_data)
-            
-            # Calculate manhole connectivity
-            manhole_connectivity = pd.concat([
-                connectivity_df['start'].value_counts(),
-                connectivity_df['end'].value_counts()
-            ]).groupby(level=0).sum()
+        if len(edges):
+            degree = graph.degree(edges)
+            in_view = np.flatnonzero(degree)
+            components = graph.connected_components(edges)
             
             # Merge with manhole data
             manhole_connectivity_df = pd.DataFrame({
-                'manhole_id': manhole_connectivity.index,
-                'connection_count': manhole_connectivity.values
-            }).merge(manhole_df[['manhole_id', 'condition', 'ward']], on='manhole_id', how='left')
+                'manhole_id': graph.nodes[in_view],
+                'connection_count': degree[in_view],
+                'inflows': graph.in_degree(edges)[in_view],
+                'outflows': graph.out_degree(edges)[in_view]
+            }).merge(manhole_df[['manhole_id', 'condition', 'ward', 'criticality']], on='manhole_id', how='left')
             
             col1, col2 = st.columns(2)
             
             with col1:
-                # Top connected manholes
-                top_connected = manhole_connectivity_df.sort_values('connection_count', ascending=False).head(10)
-                fig = px.bar(
-                    top_connected,
-                    x='manhole_id',
-                    y='connection_count',
-                    title="Top Connected Manholes",
-                    color='condition',
-                    color_discrete_map={'Good': '#4caf50', 'Fair': '#ffc107', 'Poor': '#ff9800', 'Broken': '#f44336'},
-                    text='connection_count'
-                )
-                fig.update_layout(
-                    paper_bgcolor='rgba(11,11,11,0.98)',
-                    plot_bgcolor='rgba(20,24,30,0.6)',
-                    font=dict(color='#e6eef6'),
-                    height=400,
-                    xaxis_title="Manhole ID",
-                    yaxis_title="Number of Connections",
-                    xaxis_tickangle=-45
-                )
-                fig.update_traces(textposition='outside')
-                st.plotly_chart(fig, use_container_width=True)
+                def build():
+                    # Top connected manholes
+                    top_connected = manhole_connectivity_df.sort_values('connection_count', ascending=False).head(10)
+                    # Plotly groups colour columns with groupby, which trips over unused categories
+                    top_connected = top_connected.astype({'condition': 'object'})
+                    fig = px.bar(
+                        top_connected,
+                        x='manhole_id',
+                        y='connection_count',
+                        title="Top Connected Manholes",
+                        color='condition',
+                        color_discrete_map={'Good': '#4caf50', 'Fair': '#ffc107', 'Poor': '#ff9800', 'Broken': '#f44336'},
+                        text='connection_count'
+                    )
+                    fig.update_layout(
+                        paper_bgcolor='rgba(11,11,11,0.98)',
+                        plot_bgcolor='rgba(20,24,30,0.6)',
+                        font=dict(color='#e6eef6'),
+                        height=400,
+                        xaxis_title="Manhole ID",
+                        yaxis_title="Number of Connections",
+                        xaxis_tickangle=-45
+                    )
+                    fig.update_traces(textposition='outside')
+                    return fig
+                cached_plotly_chart(render_key('pipe_network', 'top_connected_manholes', scope, selections), build, use_container_width=True)
             
             with col2:
                 # Connectivity statistics
@@ -1594,14 +3506,23 @@ def pipe_network_view(pipe_df, manhole_df):
                 st.metric("Max Connections", manhole_connectivity_df['connection_count'].max())
                 st.metric("Min Connections", manhole_connectivity_df['connection_count'].min())
                 st.metric("Highly Connected (>3)", f"{(manhole_connectivity_df['connection_count'] > 3).sum()}")
+                st.metric("Connected Networks", f"{len(np.unique(components[in_view]))}")
+                st.metric("Junctions (2+ inflows)", f"{(manhole_connectivity_df['inflows'] >= 2).sum()}")
                 
-                # Display high-connectivity critical manholes
-                critical_high_connect = manhole_connectivity_df[
-                    (manhole_connectivity_df['connection_count'] > 3) & 
+                # Critical nodes: failing manholes that a large share of the network drains through
+                critical_nodes = manhole_connectivity_df[
+                    (manhole_connectivity_df['criticality'] >= CRITICAL_NODE_THRESHOLD) & 
                     (manhole_connectivity_df['condition'].isin(['Poor', 'Broken']))
                 ]
-                if not critical_high_connect.empty:
-                    st.warning(f"⚠️ **{len(critical_high_connect)} critical manholes with high connectivity**")
+                st.metric(f"High Criticality (≥{CRITICAL_NODE_THRESHOLD:.0%})",
+                          f"{(manhole_connectivity_df['criticality'] >= CRITICAL_NODE_THRESHOLD).sum()}")
+                if not critical_nodes.empty:
+                    st.warning(f"⚠️ **{len(critical_nodes)} critical manholes in poor condition on key flow paths**")
+                    st.dataframe(
+                        critical_nodes.nlargest(10, 'criticality')[['manhole_id', 'condition', 'criticality']].round(2),
+                        use_container_width=True,
+                        hide_index=True
+                    )
     
     st.markdown("---")
     
@@ -1611,11 +3532,8 @@ def pipe_network_view(pipe_df, manhole_df):
     display_cols = ['pipe_id', 'material', 'diameter', 'length', 'layer', 'condition', 'connected_manholes']
     available_cols = [col for col in display_cols if col in filtered_pipes.columns]
     
-    st.dataframe(
-        filtered_pipes[available_cols].sort_values('length', ascending=False),
-        use_container_width=True,
-        height=400
-    )
+    paginated_table(table_index_for(pipe_index), pipe_index.positions(filtered_bits),
+                    available_cols, 'pipe_inventory', sort_by='length', descending=True)
     
     # Export
     if st.button("📥 Export Pipe Data", use_container_width=True):
@@ -1631,13 +3549,114 @@ def pipe_network_view(pipe_df, manhole_df):
 # ============================================================================
 # VIEW 5: GEOSPATIAL & MAPPING INTEGRATION
 # ============================================================================
-def geospatial_mapping_view(manhole_df, pipe_df):
+def geospatial_mapping_view(manhole_df, pipe_df, manhole_index, manhole_scope, scope):
     """Geospatial mapping view"""
     
     st.markdown("<h1 style='text-align: center;'>🗺️ GEOSPATIAL & MAPPING INTEGRATION</h1>", unsafe_allow_html=True)
     st.markdown("<h4 style='text-align: center; color: #2e7ab5;'>Interactive Maps, Network Topology & 3D Visualization</h4>", unsafe_allow_html=True)
     st.markdown("---")
     
+    # Data Filters
+    with st.expander("🔍 FILTER MAP DATA"):
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            conditions = st.multiselect(
+                "Show Conditions",
+                options=manhole_df['condition'].unique().tolist(),
+                default=manhole_df['condition'].unique().tolist()
+            )
+        
+        with col2:
+            materials = st.multiselect(
+                "Show Materials",
+                options=manhole_df['material'].unique().tolist(),
+                default=manhole_df['material'].unique().tolist()
+            )
+        
+        with col3:
+            zones = st.multiselect(
+                "Show Zones",
+                options=manhole_df['zone'].unique().tolist(),
+                default=manhole_df['zone'].unique().tolist()
+            )
+    
+    selection = manhole_index.select(
+        {'condition': conditions, 'material': materials, 'zone': zones}, base=manhole_scope
+    )
+    if manhole_index.count(selection) < len(manhole_df):
+        manhole_df = manhole_index.take(selection)
+        # Keep pipes with at least one end among the shown manholes
+        if 'upstream_mh' in pipe_df.columns:
+            shown = pd.Index(manhole_df['manhole_id'])
+            pipe_df = pipe_df[pipe_df['upstream_mh'].isin(shown) | pipe_df['downstream_mh'].isin(shown)]
+    
+    # Network trace (highlighted on the interactive and 3D maps)
+    trace, trace_key = None, None
+    with st.expander("🧭 NETWORK TRACE"):
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            trace_id = st.text_input("Manhole ID", help="Trace the catchment draining through this manhole, or its path to the outfall").strip()
+        with col2:
+            trace_direction = st.radio("Direction", ["Upstream catchment", "Downstream path"])
+        
+        if trace_id:
+            downstream = trace_direction == "Downstream path"
+            traced = trace_network(manhole_index.key[1], trace_id, downstream)
+            if traced is None:
+                st.warning(f"Manhole {trace_id} is not connected to any pipe")
+            else:
+                traced_ids, traced_edges = traced
+                all_manholes = manhole_index.frame
+                trace_pipes = load_filter_index('pipes', manhole_index.key[1]).frame.iloc[traced_edges]
+                trace = (all_manholes[all_manholes['manhole_id'].isin(traced_ids)], trace_pipes)
+                trace_key = (trace_id, downstream)
+                st.info(f"🧭 {len(traced_ids) - 1:,} manholes and {len(trace_pipes):,} pipes "
+                        f"({trace_pipes['length'].sum():,.0f} m) {'downstream' if downstream else 'upstream'} of {trace_id}")
+
+    # Nearest-asset lookup over the manholes shown, from a grid index cached per filter
+    manhole_grid = load_spatial_index(manhole_index.key, frame_key(manhole_df),
+                                      manhole_df['latitude'].to_numpy(), manhole_df['longitude'].to_numpy())
+    nearby_assets_panel(manhole_df, manhole_grid)
+
+    st.markdown("---")
+    
+    map_filters = {'conditions': conditions, 'materials': materials, 'zones': zones, 'trace': trace_key}
+    geospatial_map_panel(manhole_df, pipe_df, manhole_index, selection, manhole_grid, trace, trace_key, scope, map_filters)
+    
+    st.markdown("---")
+    geospatial_export_panel(manhole_df, pipe_df)
+
+@st.fragment
+def nearby_assets_panel(manhole_df, manhole_grid):
+    """Nearest-manhole and radius lookup; its inputs rerun only this panel"""
+    with st.expander("📍 NEARBY ASSETS"):
+        default_lat, default_lon = (manhole_df['latitude'].mean(), manhole_df['longitude'].mean()) if len(manhole_df) else (BASE_LAT, BASE_LON)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            near_lat = st.number_input("Latitude", value=float(default_lat), format="%.6f")
+        with col2:
+            near_lon = st.number_input("Longitude", value=float(default_lon), format="%.6f")
+        with col3:
+            radius_m = st.number_input("Radius (m)", min_value=10, max_value=5000, value=200, step=10)
+
+        if len(manhole_grid):
+            nearest, nearest_m = manhole_grid.nearest(near_lat, near_lon)
+            nearest_mh = manhole_df.iloc[nearest[0]]
+            st.info(f"📍 Nearest manhole: **{nearest_mh['manhole_id']}** - {nearest_m[0]:,.0f} m away ({nearest_mh['condition']})")
+            nearby, nearby_m = manhole_grid.within(near_lat, near_lon, radius_m)
+            nearby_cols = [col for col in ['manhole_id', 'road', 'ward', 'condition', 'risk_category'] if col in manhole_df.columns]
+            st.caption(f"{len(nearby):,} manholes within {radius_m:,} m")
+            st.dataframe(
+                manhole_df.iloc[nearby][nearby_cols].assign(distance_m=nearby_m.round(1)),
+                use_container_width=True,
+                hide_index=True,
+                height=250
+            )
+
+@st.fragment
+def geospatial_map_panel(manhole_df, pipe_df, manhole_index, selection, manhole_grid, trace, trace_key, scope, map_filters):
+    """Map type, zoom and the map itself; changing either reruns only this panel"""
     # Map Selection
     st.markdown("### 🎯 SELECT MAP VIEW")
     
@@ -1659,20 +3678,57 @@ def geospatial_mapping_view(manhole_df, pipe_df):
     with col2:
         zoom_level = st.slider("🔍 Zoom Level", 10, 18, 14)
     
-    st.markdown("---")
-    
-       # Map Display
+    # Map Display
     st.markdown(f"### 📍 {selected_map.split(' ')[-1].upper()} VISUALIZATION")
     
     try:
         if map_types[selected_map] == "interactive":
-            center_lat = manhole_df['latitude'].mean()
-            center_lon = manhole_df['longitude'].mean()
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                center_id = st.text_input("📌 Centre on manhole", placeholder="Manhole ID",
+                                          help="Centre the map (and the level-of-detail view) on a manhole; "
+                                               "blank centres it on the filtered network").strip()
+            with col2:
+                use_lod = st.checkbox(
+                    "⚡ Level of detail",
+                    value=len(manhole_df) + len(pipe_df) > LOD_ASSET_LIMIT,
+                    help=f"Grid cells below zoom {LOD_DETAIL_ZOOM}; individual assets in view above it"
+                )
             
-            m = create_folium_map(manhole_df, pipe_df, center_lat, center_lon, zoom_level)
+            center = manhole_location(manhole_index.frame, center_id) if center_id else None
+            if center_id and center is None:
+                st.warning(f"Manhole {center_id} not found - centred on the filtered network")
+                center_id = ''
+            center_lat, center_lon = center or (manhole_df['latitude'].mean(), manhole_df['longitude'].mean())
+            heat_overlay = load_density_overlay(manhole_index.key, frame_key(manhole_df), zoom_level, 'Condition', 'heat', manhole_df)
+            if use_lod:
+                bounds = viewport_bounds(center_lat, center_lon, zoom_level, 1000, 600)
+                if zoom_level < LOD_DETAIL_ZOOM:
+                    scope_key = hashlib.sha1(selection.tobytes()).hexdigest()
+                    cells = load_grid_pyramid(manhole_index.key, scope_key, manhole_df)[zoom_level]
+                    cells = cells[in_bounds(cells['latitude'], cells['longitude'], bounds)]
+                    build = lambda: create_folium_map(manhole_df.iloc[:0], pipe_df.iloc[:0], center_lat, center_lon, zoom_level,
+                                                      cells=cells, heat_overlay=heat_overlay, trace=trace)
+                    st.caption(f"Showing {len(cells):,} grid cells - zoom to {LOD_DETAIL_ZOOM}+ for individual manholes and pipes")
+                else:
+                    shown = manhole_df.iloc[manhole_grid.bbox(bounds)]
+                    pipes_shown = pipe_df
+                    if 'start_latitude' in pipe_df.columns:
+                        pipes_shown = pipe_df[segments_in_bounds(
+                            pipe_df['start_latitude'], pipe_df['start_longitude'],
+                            pipe_df['end_latitude'], pipe_df['end_longitude'], bounds
+                        )]
+                    build = lambda: create_folium_map(shown, pipes_shown, center_lat, center_lon, zoom_level,
+                                                      heat_overlay=heat_overlay, trace=trace)
+                    st.caption(f"Showing {len(shown):,} manholes and {len(pipes_shown):,} pipes in view")
+            else:
+                build = lambda: create_folium_map(manhole_df, pipe_df, center_lat, center_lon, zoom_level,
+                                                  heat_overlay=heat_overlay, trace=trace)
             
             # Display map directly
-            folium_static(m, width=1000, height=600)
+            map_key = render_key('geospatial', ('interactive', use_lod), scope,
+                                 {**map_filters, 'zoom': zoom_level, 'center': center_id})
+            cached_folium_map(map_key, build, width=1000, height=600)
             
             # Legend
             with st.expander("🗺️ MAP LEGEND & CONTROLS"):
@@ -1684,6 +3740,7 @@ def geospatial_mapping_view(manhole_df, pipe_df):
                     - 🔵 Blue: Fair condition  
                     - 🟠 Orange: Poor condition
                     - 🔴 Red: Broken condition
+                    - 🟣 Purple: Inaccessible
                     """)
                 with col2:
                     st.markdown("""
@@ -1695,7 +3752,8 @@ def geospatial_mapping_view(manhole_df, pipe_df):
                     """)
         
         elif map_types[selected_map] == "3d":
-            deck = create_pydeck_3d_map(manhole_df, pipe_df)
+            deck = load_pydeck_3d_map(manhole_index.key, frame_key(manhole_df), frame_key(pipe_df), trace_key,
+                                      manhole_df, pipe_df, trace[1] if trace is not None else None)
             st.pydeck_chart(deck)
             
             with st.expander("🎮 3D CONTROLS"):
@@ -1712,103 +3770,53 @@ def geospatial_mapping_view(manhole_df, pipe_df):
                 """)
         
         elif map_types[selected_map] == "topology":
-            # Create network visualization
-            fig = go.Figure()
-            
-            # Add edges (pipes)
-            for idx, row in pipe_df.iterrows():
-                if 'start_latitude' in row and pd.notna(row['start_latitude']):
-                    fig.add_trace(go.Scatter(
-                        x=[row['start_longitude'], row['end_longitude']],
-                        y=[row['start_latitude'], row['end_latitude']],
-                        mode='lines',
-                        line=dict(width=1, color='rgba(100, 150, 255, 0.3)'),
-                        showlegend=False
-                    ))
-            
-            # Add nodes (manholes)
-            condition_colors = {'Good': 'green', 'Fair': 'blue', 'Poor': 'orange', 'Broken': 'red'}
-            colors = [condition_colors.get(cond, 'gray') for cond in manhole_df['condition']]
-            
-            fig.add_trace(go.Scatter(
-                x=manhole_df['longitude'],
-                y=manhole_df['latitude'],
-                mode='markers',
-                marker=dict(size=8, color=colors, line=dict(width=1, color='white')),
-                text=manhole_df['manhole_id'],
-                hoverinfo='text',
-                name='Manholes'
-            ))
-            
-            fig.update_layout(
-                title='Network Topology',
-                showlegend=True,
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                font=dict(color='#e6eef6'),
-                height=600,
-                xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False)
+            webgl = st.checkbox(
+                "⚡ WebGL rendering",
+                value=len(pipe_df) > TOPOLOGY_WEBGL_EDGES,
+                help="Draw with Scattergl; recommended for large networks"
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            cached_plotly_chart(render_key('geospatial', ('topology', webgl), scope, map_filters),
+                                lambda: create_topology_figure(manhole_df, pipe_df, webgl=webgl),
+                                use_container_width=True)
         
         elif map_types[selected_map] == "heatmap":
-            fig = px.density_mapbox(
-                manhole_df,
-                lat='latitude',
-                lon='longitude',
-                z='no_of_connections' if 'no_of_connections' in manhole_df.columns else None,
-                radius=15,
-                center=dict(lat=manhole_df['latitude'].mean(), lon=manhole_df['longitude'].mean()),
-                zoom=zoom_level,
-                mapbox_style="carto-darkmatter",
-                title="Network Density Heatmap",
-                color_continuous_scale="Hot",
-                height=600
-            )
-            
-            fig.update_layout(
-                paper_bgcolor='rgba(11,11,11,0.98)',
-                plot_bgcolor='rgba(20,24,30,0.6)',
-                font=dict(color='#e6eef6')
-            )
+            weighting = st.radio("Weight by", ['Connections', 'Condition'], horizontal=True)
+
+            def build():
+                overlay = load_density_overlay(manhole_index.key, frame_key(manhole_df), zoom_level, weighting, 'hot', manhole_df)
             
-            st.plotly_chart(fig, use_container_width=True)
+                fig = go.Figure(go.Scattermapbox(lat=[], lon=[], mode='markers', showlegend=False))
+                if overlay is not None:
+                    image, (south, west, north, east) = overlay
+                    fig.update_layout(mapbox_layers=[{
+                        'sourcetype': 'image',
+                        'source': image,
+                        'coordinates': [[west, north], [east, north], [east, south], [west, south]]
+                    }])
+                fig.update_layout(
+                    title="Network Density Heatmap",
+                    mapbox=dict(
+                        style="carto-darkmatter",
+                        center=dict(lat=manhole_df['latitude'].mean(), lon=manhole_df['longitude'].mean()),
+                        zoom=zoom_level
+                    ),
+                    height=600,
+                    paper_bgcolor='rgba(11,11,11,0.98)',
+                    plot_bgcolor='rgba(20,24,30,0.6)',
+                    font=dict(color='#e6eef6')
+                )
+                return fig
+
+            cached_plotly_chart(render_key('geospatial', ('heatmap', weighting), scope, {**map_filters, 'zoom': zoom_level}),
+                                build, use_container_width=True)
     
     except Exception as e:
         st.error(f"⚠️ Error displaying map: {str(e)}")
         st.info("Please ensure all required packages are installed.")
-    
-    st.markdown("---")
-    
-    # Data Filters
-    with st.expander("🔍 FILTER MAP DATA"):
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            conditions = st.multiselect(
-                "Show Conditions",
-                options=manhole_df['condition'].unique().tolist(),
-                default=manhole_df['condition'].unique().tolist()
-            )
-        
-        with col2:
-            materials = st.multiselect(
-                "Show Materials",
-                options=manhole_df['material'].unique().tolist(),
-                default=manhole_df['material'].unique().tolist()
-            )
-        
-        with col3:
-            zones = st.multiselect(
-                "Show Zones",
-                options=manhole_df['zone'].unique().tolist(),
-                default=manhole_df['zone'].unique().tolist()
-            )
-    
-    # Export
-    st.markdown("---")
+
+@st.fragment
+def geospatial_export_panel(manhole_df, pipe_df):
+    """Coordinate and network CSV exports"""
     st.markdown("### 💾 EXPORT GEOSPATIAL DATA")
     
     col1, col2 = st.columns(2)
@@ -1838,10 +3846,36 @@ def geospatial_mapping_view(manhole_df, pipe_df):
 # ============================================================================
 # MAIN APP
 # ============================================================================
+def refresh_data(quick=False):
+    """Drop the in-memory tables and every resource derived from them.
+    
+    Runs as a button callback, ahead of the script run that loads the data.
+    Everything is keyed on the data version, so an edited survey is picked up
+    on the next run regardless; this reloads from disk and frees the entries of
+    older versions. With ``quick`` the changed survey rows are first applied to
+    the disk cache here rather than by the loaders of that run, and the outcome
+    is left in ``st.session_state.last_refresh`` for the sidebar.
+    """
+    changes = incremental_refresh() if quick else None
+    st.cache_data.clear()
+    for resource in (load_manhole_data, load_pipe_data, load_filter_index, load_table_index,
+                     load_sewer_graph, load_cube, load_spatial_index):
+        resource.clear()
+    render_cache().clear()
+    if quick:
+        st.session_state.last_refresh = ("Full reload (no cached network yet)" if changes is None
+                                         else f"Updated {changes[0]} manholes, {changes[1]} pipes")
+
 def main():
-    # Load data
-    manhole_df = load_manhole_data()
-    pipe_df = load_pipe_data()
+    # Load data (the filter indexes hold the base tables)
+    version = data_version()
+    manhole_index = load_filter_index('manholes', version)
+    pipe_index = load_filter_index('pipes', version)
+    manhole_df, pipe_df = manhole_index.frame, pipe_index.frame
+    manhole_scope, pipe_scope = manhole_index.all(), pipe_index.all()
+    # Sidebar selections, keyed into every cached chart alongside the data version
+    global_filters = {}
+    pipe_areas = {}
     
     # Sidebar
     with st.sidebar:
@@ -1880,21 +3914,33 @@ def main():
         st.markdown("### 🎯 GLOBAL FILTERS")
         
         if 'zone' in manhole_df.columns:
-            zones = ["All Zones"] + sorted(manhole_df['zone'].unique().tolist())
+            zones = ["All Zones"] + sorted(manhole_index.values('zone'))
             selected_zone = st.selectbox("📍 Zone", zones)
+            global_filters['zone'] = selected_zone
             if selected_zone != "All Zones":
-                manhole_df = manhole_df[manhole_df['zone'] == selected_zone]
-                # Also filter pipes connected to these manholes
-                if 'connected_manholes' in pipe_df.columns:
-                    pipe_df = pipe_df[pipe_df['connected_manholes'].apply(
-                        lambda x: any(zone in x for zone in [selected_zone])
-                    )]
+                manhole_scope = manhole_index.select({'zone': [selected_zone]}, base=manhole_scope)
+                pipe_areas['zone'] = [selected_zone]
         
         if 'ward' in manhole_df.columns:
-            wards = ["All Wards"] + sorted(manhole_df['ward'].unique().tolist())
+            wards = ["All Wards"] + sorted(manhole_index.values('ward', manhole_scope))
             selected_ward = st.selectbox("🏛️ Ward", wards)
+            global_filters['ward'] = selected_ward
             if selected_ward != "All Wards":
-                manhole_df = manhole_df[manhole_df['ward'] == selected_ward]
+                manhole_scope = manhole_index.select({'ward': [selected_ward]}, base=manhole_scope)
+                pipe_areas['ward'] = [selected_ward]
+        
+        # Pipes follow the area filters through the zone/ward of their end manholes
+        pipe_match = st.radio("🔗 Pipes in area", list(PIPE_END_MATCH), horizontal=True,
+                              help="Keep pipes with either end, or both ends, in the selected zone and ward")
+        if pipe_areas:
+            global_filters['pipe_match'] = pipe_match
+            pipe_scope = pipe_area_scope(pipe_index, pipe_areas, pipe_match, base=pipe_scope)
+        
+        manhole_df = manhole_index.take(manhole_scope)
+        pipe_df = pipe_index.take(pipe_scope)
+        manhole_cube = cube_for(manhole_index, manhole_scope)
+        pipe_cube = cube_for(pipe_index, pipe_scope)
+        scope = (version, global_filters)
         
         st.markdown("---")
         
@@ -1908,7 +3954,7 @@ def main():
             st.metric("Pipes", f"{len(pipe_df):,}")
         
         if 'condition' in manhole_df.columns:
-            critical = manhole_df[manhole_df['condition'].isin(['Poor', 'Broken'])].shape[0]
+            critical = int(rollup(manhole_cube, filters={'condition': ['Poor', 'Broken']})['count'])
             st.progress((len(manhole_df) - critical) / len(manhole_df) if len(manhole_df) > 0 else 0)
             st.caption(f"Network Health: {((len(manhole_df) - critical)/len(manhole_df)*100):.1f}%")
         
@@ -1922,9 +3968,12 @@ def main():
         if st.button("📥 Export All Data", use_container_width=True):
             st.session_state.export_ready = True
         
-        if st.button("🔄 Refresh Data", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
+        st.button("⚡ Quick Refresh", use_container_width=True, help="Apply only new or edited survey rows",
+                  on_click=refresh_data, kwargs={'quick': True})
+        st.button("🔄 Refresh Data", use_container_width=True, on_click=refresh_data)
+        
+        if 'last_refresh' in st.session_state:
+            st.caption(f"⚡ {st.session_state.last_refresh}")
         
         st.markdown("---")
         
@@ -1941,15 +3990,15 @@ def main():
     
     # Main Content Routing
     if view_option == "🏠 Executive Dashboard":
-        executive_dashboard_view(manhole_df, pipe_df)
+        executive_dashboard_view(manhole_df, pipe_df, manhole_cube, scope)
     elif view_option == "🔍 Manhole Condition & Risk":
-        manhole_condition_view(manhole_df)
+        manhole_condition_view(manhole_df, manhole_index, manhole_scope, manhole_cube, scope)
     elif view_option == "🏗️ Material & Cover Analysis":
-        material_cover_view(manhole_df)
+        material_cover_view(manhole_df, manhole_cube, scope)
     elif view_option == "🔗 Pipe Network & Connections":
-        pipe_network_view(pipe_df, manhole_df)
+        pipe_network_view(pipe_df, manhole_df, pipe_index, pipe_scope, pipe_cube, scope)
     elif view_option == "🗺️ Geospatial & Mapping":
-        geospatial_mapping_view(manhole_df, pipe_df)
+        geospatial_mapping_view(manhole_df, pipe_df, manhole_index, manhole_scope, scope)
 
 # ============================================================================
 # RUN APP
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+def test_vincenty_agrees_with_geopy_within_a_millimetre():
+    geodesic = pytest.importorskip("geopy.distance").geodesic
+    rng = np.random.default_rng(0)
+    # City-scale pipes around Mangalore plus long and equatorial lines
+    lat1 = np.r_[app.BASE_LAT + rng.uniform(-0.05, 0.05, 200), 0.0, 12.9, -33.9]
+    lon1 = np.r_[app.BASE_LON + rng.uniform(-0.05, 0.05, 200), 10.0, 74.8, 18.4]
+    lat2 = np.r_[lat1[:200] + rng.uniform(-0.002, 0.002, 200), 0.0, 28.6, 51.5]
+    lon2 = np.r_[lon1[:200] + rng.uniform(-0.002, 0.002, 200), 12.0, 77.2, -0.1]
+
+    expected = [geodesic((a, b), (c, d)).meters for a, b, c, d in zip(lat1, lon1, lat2, lon2)]
+    np.testing.assert_allclose(app.vincenty_m(lat1, lon1, lat2, lon2), expected, rtol=0, atol=1e-3)
+
+
+def test_pipe_lengths_use_the_chosen_kernel():
+    pipes = pd.DataFrame({'pipe_id': ['P1'], 'upstream_mh': ['A'], 'downstream_mh': ['B'],
+                          'surveyed_length': [np.nan], 'depth': [np.nan]})
+    manholes = pd.DataFrame({'manhole_id': ['A', 'B'], 'latitude': [12.91, 12.92], 'longitude': [74.85, 74.86],
+                             'pipe_material': ['PVC', 'PVC'], 'pipe_diameter': ['150mm', '150mm'],
+                             'condition': ['Good', 'Good'], 'depth': [2.0, 2.0]})
+
+    for method, kernel in app.DISTANCE_KERNELS.items():
+        resolved = app.resolve_pipe_ends(pipes.copy(), manholes, method=method)
+        assert resolved['length'].iloc[0] == pytest.approx(kernel(12.91, 74.85, 12.92, 74.86))
+    with pytest.raises(ValueError):
+        app.resolve_pipe_ends(pipes.copy(), manholes, method='geodesic')
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+
+def test_pipe_area_scope_matches_zone_and_ward_on_the_same_end():
+    pipes = pd.DataFrame({
+        'upstream_zone': ['Z1', 'Z1', 'Z2', 'Z2'],
+        'upstream_ward': ['W2', 'W1', 'W1', 'W2'],
+        'downstream_zone': ['Z2', 'Z2', 'Z1', 'Z1'],
+        'downstream_ward': ['W1', 'W2', 'W1', 'W1'],
+    })
+    index = app.FilterIndex(pipes, app.PIPE_FILTER_COLUMNS)
+    areas = {'zone': ['Z1'], 'ward': ['W1']}
+
+    # Pipe 0 has one end in Z1 and the other in W1, but neither end in both
+    either = app.pipe_area_scope(index, areas, 'Either end')
+    assert index.positions(either).tolist() == [1, 2, 3]
+    both = app.pipe_area_scope(index, areas, 'Both ends')
+    assert index.positions(both).tolist() == []
+    assert np.array_equal(app.pipe_area_scope(index, {'zone': [], 'ward': None}), index.all())
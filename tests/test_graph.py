@@ -0,0 +1,43 @@
+import numpy as np
+
+import app
+
+
+def test_dangling_pipes_join_no_adjacency():
+    # A -> B -> C, plus a pipe from B to a manhole missing from the survey
+    graph = app.SewerGraph(["A", "B", "B"], ["B", "C", "X"], resolved=[True, True, False])
+
+    assert list(graph.nodes) == ["A", "B", "C"]
+    assert graph.degree().tolist() == [1, 2, 1]
+    assert graph.degree([1, 2]).tolist() == [0, 1, 1]
+    nodes, edges = graph.trace(graph.node_ids(["B"])[0], downstream=True)
+    assert graph.nodes[nodes].tolist() == ["B", "C"]
+    assert edges.tolist() == [1]
+    assets, _ = graph.flow_accumulation(np.ones(3))
+    assert assets.tolist() == [0, 1, 2]
+
+
+def test_flow_accumulation_counts_each_upstream_asset_once():
+    # A <-> B loop draining B -> C -> D
+    graph = app.SewerGraph(["A", "B", "B", "C"], ["B", "A", "C", "D"])
+    assets, length = graph.flow_accumulation(np.array([1.0, 2.0, 4.0, 8.0]))
+    assert assets.tolist() == [1, 1, 2, 3]
+    assert length.tolist() == [3, 3, 7, 15]
+    nodes, edges = graph.trace(graph.node_ids(["D"])[0])
+    assert assets[-1] == len(nodes) - 1
+    assert len(edges) == 4
+
+    # Diamond A -> B -> C, A -> C, C -> D
+    graph = app.SewerGraph(["A", "B", "A", "C"], ["B", "C", "C", "D"])
+    assets, length = graph.flow_accumulation(np.array([1.0, 2.0, 4.0, 8.0]))
+    assert assets.tolist() == [0, 1, 2, 3]
+    assert length.tolist() == [0, 1, 7, 15]
+
+
+def test_flow_accumulation_forest_matches_catchment():
+    # Two branches joining at C, then a second outfall chain E -> F
+    graph = app.SewerGraph(["A", "B", "C", "E"], ["C", "C", "D", "F"])
+    assets, length = graph.flow_accumulation(np.array([1.0, 2.0, 4.0, 8.0]))
+    assert list(graph.nodes) == ["A", "B", "C", "E", "D", "F"]
+    assert assets.tolist() == [0, 0, 2, 0, 3, 1]
+    assert length.tolist() == [0, 0, 3, 0, 7, 8]
@@ -0,0 +1,13 @@
+import pandas as pd
+
+import app
+
+
+def test_manhole_csv_without_depth_column(survey):
+    raw = pd.read_csv(app.MANHOLE_CSV).drop(columns=["Depth"])
+    raw.to_csv(app.MANHOLE_CSV, index=False)
+
+    manholes = app._clean_manhole_rows(app.read_manhole_csv())
+
+    assert len(manholes) == len(raw)
+    assert manholes["depth"].isna().all()
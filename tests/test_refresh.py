@@ -0,0 +1,98 @@
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import app
+
+
+def cached_tables():
+    manholes = app.cached_table("manholes", [app.MANHOLE_CSV], app._build_manhole_table)
+    pipes = app.cached_table("pipes", [app.PIPE_CSV, app.MANHOLE_CSV], lambda: app._build_pipe_table(manholes))
+    return manholes, pipes
+
+
+def rebuilt_tables():
+    manholes = app._build_manhole_table().drop(columns=app.ROW_HASH)
+    pipes = app._clean_pipe_rows(app.read_pipe_csv(), manholes).drop(columns=app.ROW_HASH)
+    return manholes, pipes
+
+
+def assert_same_rows(actual, expected, key):
+    actual = actual.sort_values(key, kind="stable").reset_index(drop=True)
+    expected = expected.sort_values(key, kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def append_rows(path, rows):
+    with open(path, "a", newline="") as fh:
+        rows.to_csv(fh, header=False, index=False)
+
+
+def append_manhole(manhole_id):
+    manholes = pd.read_csv(app.MANHOLE_CSV, dtype=str)
+    append_rows(app.MANHOLE_CSV, manholes.tail(1).assign(ID=manhole_id))
+
+
+def test_appended_rows_refresh_like_a_full_rebuild(survey):
+    # A pipe export without IDs falls back to position-numbered pipe ids
+    pipes = pd.read_csv(app.PIPE_CSV, dtype=str).drop(columns=["ID"])
+    pipes.to_csv(app.PIPE_CSV, index=False)
+    cached_tables()
+
+    manholes = pd.read_csv(app.MANHOLE_CSV, dtype=str)
+    new_manholes = manholes.tail(2).assign(ID=["NEW1", "NEW2"], x=None, y=None)
+    append_rows(app.MANHOLE_CSV, new_manholes)
+    append_rows(app.PIPE_CSV, pipes.head(3).assign(**{"U/S MH": "NEW1", "D/S MH": "NEW2"}))
+
+    assert app.incremental_refresh() is not None
+    manholes, pipes = cached_tables()
+    expected_manholes, expected_pipes = rebuilt_tables()
+
+    assert pipes["pipe_id"].is_unique
+    assert_same_rows(manholes, expected_manholes, "manhole_id")
+    assert_same_rows(pipes, expected_pipes, "pipe_id")
+
+
+def refresh_script():
+    """The sidebar's refresh buttons over the cached indexes main() reads"""
+    import streamlit as st
+
+    import app
+
+    st.button("⚡ Quick Refresh", on_click=app.refresh_data, kwargs={"quick": True})
+    st.button("🔄 Refresh Data", on_click=app.refresh_data)
+    st.caption(st.session_state.get("last_refresh", ""))
+    version = app.data_version()
+    st.metric("Manholes", app.load_filter_index("manholes", version).size)
+    st.metric("Pipes", app.load_filter_index("pipes", version).size)
+
+
+def manhole_count(at):
+    return int(at.metric[0].value)
+
+
+def fail_full_build(*args):
+    raise AssertionError("full rebuild after an append")
+
+
+def test_cached_indexes_follow_the_survey(survey, monkeypatch):
+    at = AppTest.from_function(refresh_script, default_timeout=120).run()
+    before = manhole_count(at)
+    # From here on every survey change must be applied incrementally
+    monkeypatch.setattr(app, "_build_manhole_table", fail_full_build)
+    monkeypatch.setattr(app, "_build_pipe_table", fail_full_build)
+
+    # A new data version is never served from the previous version's tables
+    append_manhole("NEW1")
+    at.run()
+    assert manhole_count(at) == before + 1
+
+    append_manhole("NEW2")
+    at.button[0].click().run()
+    assert not at.exception
+    assert at.caption[0].value == "Updated 1 manholes, 0 pipes"
+    assert manhole_count(at) == before + 2
+
+    append_manhole("NEW3")
+    at.button[1].click().run()
+    assert not at.exception
+    assert manhole_count(at) == before + 3
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(app, "CSV_CHUNK_ROWS", 100)
+
+
+def drop_coordinates(path, every=7):
+    """Blank the survey fix of every ``every``-th manhole so the synthetic fallback is used"""
+    raw = pd.read_csv(path, dtype=str)
+    raw.loc[::every, ["x", "y"]] = np.nan
+    raw.to_csv(path, index=False)
+
+
+def test_streamed_manholes_match_eager_ingest(survey, small_chunks):
+    drop_coordinates(app.MANHOLE_CSV)
+
+    eager = app._clean_manhole_rows(app.read_manhole_csv())
+    streamed = app.stream_csv(app.MANHOLE_CSV, app.MANHOLE_DTYPES, app.MANHOLE_COLUMNS,
+                              app._clean_manhole_rows, "manhole survey")
+
+    pd.testing.assert_frame_equal(streamed, eager)
+    assert eager["latitude"].round(6).duplicated().sum() < len(eager) // 10
+
+
+def test_streamed_pipes_match_eager_ingest(survey, small_chunks):
+    manholes = app._clean_manhole_rows(app.read_manhole_csv())
+
+    eager = app._clean_pipe_rows(app.read_pipe_csv(), manholes)
+    streamed = app.stream_csv(app.PIPE_CSV, app.PIPE_DTYPES, app.PIPE_COLUMNS,
+                              lambda chunk: app._clean_pipe_rows(chunk, manholes), "pipe network")
+
+    pd.testing.assert_frame_equal(streamed, eager)
+
+
+def test_concat_keeps_diameters_in_size_order():
+    parts = [
+        pd.DataFrame({"pipe_diameter": app.normalize_diameter(pd.Series(values))})
+        for values in (["12 inch", "8"], ["200mm", "6 inch"])
+    ]
+
+    merged = app.concat_tables(parts)
+
+    assert list(merged["pipe_diameter"].cat.categories) == ["6 inch", "200mm", "8 inch", "12 inch", "Unknown"]
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+
+def test_lod_viewport_follows_the_chosen_manhole():
+    manholes = pd.DataFrame({'manhole_id': ['A', 'B'], 'latitude': [12.90, 12.95], 'longitude': [74.84, 74.89]})
+    center = app.manhole_location(manholes, 'B')
+    assert center == (12.95, 74.89)
+    assert app.manhole_location(manholes, 'C') is None
+
+    bounds = app.viewport_bounds(*center, 17, 1000, 600)
+    assert app.in_bounds(manholes['latitude'], manholes['longitude'], bounds).tolist() == [False, True]
+
+
+def test_pipes_crossing_the_view_are_kept():
+    bounds = (12.0, 74.0, 12.1, 74.1)
+    start_lat, start_lon = np.array([11.9, 12.05, 11.9, np.nan]), np.array([74.05, 74.05, 73.9, 74.05])
+    end_lat, end_lon = np.array([12.2, 12.3, 11.95, 12.05]), np.array([74.05, 74.05, 73.95, 74.05])
+
+    # Crossing with both ends outside, one end inside, entirely outside, unresolved end
+    kept = app.segments_in_bounds(start_lat, start_lon, end_lat, end_lon, bounds)
+    assert kept.tolist() == [True, True, False, False]